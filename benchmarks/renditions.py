@@ -0,0 +1,94 @@
+"""Rendition pipeline micro-benchmark.
+
+Compares the legacy decode/re-save/temp-file pipeline with
+faceapi.core.renditions on a synthetic EXIF-rotated photo. Each variant
+runs in its own process so peak RSS is measured independently.
+
+    python benchmarks/renditions.py [--size 4000x3000] [--runs 5]
+"""
+import argparse
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC = Path(__file__).parent.parent / "src"
+
+
+def legacy(image_path: Path, out: Path):
+    from PIL import Image
+    from PIL.ImageOps import exif_transpose
+
+    img = Image.open(image_path.as_posix())
+    img = exif_transpose(img)
+    img.save(image_path.as_posix())
+    img = Image.open(image_path.as_posix())
+    img.save((out / "x.webp").as_posix())
+    img.thumbnail((300, 300))
+    img.save((out / "x.thumbnail.webp").as_posix())
+
+
+def pipeline(image_path: Path, out: Path):
+    sys.path.insert(0, SRC.as_posix())
+    from faceapi.core.renditions import renditions
+
+    for r in renditions(image_path):
+        assert r.data
+
+
+def make_image(path: Path, size: tuple[int, int]):
+    from PIL import Image
+
+    img = Image.effect_mandelbrot(size, (-2.0, -1.2, 0.8, 1.2), 64).convert("RGB")
+    exif = img.getexif()
+    exif[0x0112] = 6
+    img.save(path.as_posix(), format="JPEG", exif=exif, quality=90)
+
+
+def child(variant: str, source: Path, runs: int):
+    fn = dict(legacy=legacy, pipeline=pipeline)[variant]
+    timings = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for idx in range(runs):
+            work = Path(tmp) / f"{idx}.jpg"
+            work.write_bytes(source.read_bytes())
+            start = time.perf_counter()
+            fn(work, Path(tmp))
+            timings.append(time.perf_counter() - start)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    best = min(timings) * 1000
+    mean = sum(timings) / len(timings) * 1000
+    print(f"{variant:<10} best {best:8.1f} ms  mean {mean:8.1f} ms  peak rss {rss:8.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", default="4000x3000")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", nargs=2, metavar=("VARIANT", "SOURCE"))
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child[0], Path(args.child[1]), args.runs)
+    width, height = map(int, args.size.split("x"))
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "source.jpg"
+        make_image(source, (width, height))
+        for variant in ("legacy", "pipeline"):
+            subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--runs",
+                    f"{args.runs}",
+                    "--child",
+                    variant,
+                    source.as_posix(),
+                ],
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
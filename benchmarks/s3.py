@@ -0,0 +1,91 @@
+"""S3 client micro-benchmark against a local moto server.
+
+Measures upload/download/delete throughput of faceapi.core.s3.S3 with a
+fresh boto3 client per operation (the previous behaviour) and with the
+shared long-lived client.
+
+    pip install "moto[server]"
+    python benchmarks/s3.py [--ops 200] [--threads 8] [--size 65536]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+SRC = Path(__file__).parent.parent / "src"
+
+SETTINGS = """
+db: {{url: "postgres://localhost/faceapi"}}
+redis: {{url: "redis://localhost/0"}}
+api: {{host: "localhost", port: 0, assets: "{tmp}/assets"}}
+aws:
+  cloudfront_host: localhost
+  access_key_id: bench
+  secret_access_key: bench
+  s3_region: us-east-1
+  storage_bucket_name: bench
+  media_location: media
+  endpoint_url: "{endpoint}"
+firebase: {{admin_json: "", db: ""}}
+masha: {{host: "localhost", port: 0}}
+access: {{nsfw: {{}}}}
+"""
+
+
+def run(S3, label: str, ops: int, threads: int, payload: bytes, fresh: bool, tmp: Path):
+    def op(idx: int):
+        if fresh:
+            S3._instance = None
+        name = f"{label}-{idx}.bin"
+        S3.upload(BytesIO(payload), name)
+        if fresh:
+            S3._instance = None
+        S3.download(name, tmp / name)
+        if fresh:
+            S3._instance = None
+        S3.delete(name)
+
+    S3._instance = None
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(op, range(ops)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<8} {ops * 3 / elapsed:8.1f} ops/s  ({ops} x put/get/delete, {threads} threads)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--size", type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    server = ThreadedMotoServer(port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    endpoint = f"http://{host}:{port}"
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Path(tmp) / "settings.yaml"
+        settings.write_text(SETTINGS.format(tmp=tmp, endpoint=endpoint))
+        os.environ["FACE_CONFIG_FILE"] = settings.as_posix()
+        sys.path.insert(0, SRC.as_posix())
+        from faceapi.core.s3 import S3
+
+        S3()._client.create_bucket(Bucket="bench")
+        payload = b"\x89PNG\r\n\x1a\n" + os.urandom(args.size)
+        for label, fresh in (("fresh", True), ("shared", False)):
+            run(S3, label, args.ops, args.threads, payload, fresh, Path(tmp))
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,22 +2,24 @@ from pathlib import Path
 import time
 from rich import print
 import typer
-from faceapi.core import s3
+from faceapi.core.reconcile import reconcile
+from datetime import timedelta
 from faceapi.core.commands import Command
 from faceapi.database.enums import ImageType, Status
 from faceapi.firebase.db import GeneerationDb
 from firebase_admin.db import Event
-from faceapi.database import Generated, Image, Prompt, create_tables
+from faceapi.database import Database, Generated, Image, Prompt, create_tables
+from playhouse.migrate import PostgresqlMigrator, migrate as migrate_schema
 from typing_extensions import Annotated
 from coreimage.terminal import print_term_image
 import logging
-from corestring import file_hash
+from faceapi.core.hashing import content_hash
 from faceapi.core.queue import GeneratorQueue
 from threading import Event as TEvent
 from faceapi.core.jobs import update_options as job_update_options
 from faceapi.core.jobs import update_access as job_update_access
 from faceapi.core.jobs import resume_generations as job_resume_generations
-from faceapi.config import app_config
+from faceapi.core.jobs import resume_renditions as job_resume_renditions
 
 cli = typer.Typer()
 
@@ -62,16 +64,27 @@ def init_db():
         logging.info("ignored")
         
 @cli.command()
-def clean():
-    gen_ids = [x.image.Image.split(".")[0] for x in Generated.select() if x.image]
-    objs = [k["Key"] for k in s3.S3.list(dst=app_config.aws.media_location)]
-    for obj in objs:
-        id = obj.split("/")[-1].split(".")[0]
-        if id not in gen_ids:
-            print(id, obj)
-            print(s3.S3.delete(obj.split("/")[-1]))
-    pass
-        
+def migrate():
+    migrator = PostgresqlMigrator(Database.db)
+    columns = [c.name for c in Database.db.get_columns(Image._meta.table_name)]
+    if "ready" not in columns:
+        migrate_schema(migrator.add_column(Image._meta.table_name, "ready", Image.ready))
+        logging.info("added face_image.ready")
+    table = Generated._meta.table_name
+    indexes = [i.columns for i in Database.db.get_indexes(table)]
+    if ["uid", "last_modified", "slug"] not in indexes:
+        migrate_schema(migrator.add_index(table, ("uid", "last_modified", "slug"), False))
+        logging.info(f"added {table} (uid, last_modified, slug) index")
+
+
+@cli.command()
+def clean(
+    dry_run: Annotated[bool, typer.Option("--dry-run/--delete")] = True,
+    min_age: Annotated[int, typer.Option("--min-age", help="hours")] = 1,
+    workers: Annotated[int, typer.Option("-w", "--workers")] = 4,
+):
+    reconcile(dry_run=dry_run, min_age=timedelta(hours=min_age), workers=workers)
+
 
 @cli.command()
 def update_options():
@@ -83,6 +96,7 @@ def update_options():
 
 @cli.command()
 def resume():
+    job_resume_renditions()
     job_resume_generations()
 
 
@@ -119,7 +133,7 @@ def generate(
 ):
     assert face_path.exists()
     source, _ = Image.get_or_create(
-        Type=ImageType.SOURCE, Image=face_path.as_posix(), hash=file_hash(face_path)
+        Type=ImageType.SOURCE, Image=face_path.as_posix(), hash=content_hash(face_path)
     )
     prompt_obj, _ = Prompt.get_or_create(
         model=model,
@@ -139,7 +153,11 @@ def generate(
         prompt=prompt_obj
     )
     if generated.Status != Status.GENERATED:
-        GeneratorQueue().put_nowait((Command.GENERATE, generated.slug))
+        GeneratorQueue().put_nowait(
+            (Command.GENERATE, generated.slug),
+            uid=generated.uid,
+            affinity=prompt_obj.affinity,
+        )
         l = listener(generated)
         l.listen()
         generated: Generated = (
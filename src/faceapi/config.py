@@ -3,12 +3,13 @@ from pydantic.fields import FieldInfo
 from pydantic_settings import BaseSettings, PydanticBaseSettingsSource
 from pathlib import Path
 from typing import Optional, Any, Type
-from appdirs import user_config_dir
+from appdirs import user_config_dir, user_cache_dir
 from faceapi import __name__
 from os import environ
 import yaml
 
 USER_CONFIG_PATH = Path(user_config_dir(appname=__name__))
+USER_CACHE_PATH = Path(user_cache_dir(appname=__name__))
 DEFAULT_CONFIG_FILE_PATH = USER_CONFIG_PATH / "settings.yaml"
 
 config_file = Path(environ.get("FACE_CONFIG_FILE", DEFAULT_CONFIG_FILE_PATH.as_posix()))
@@ -27,11 +28,41 @@ except AssertionError:
 
 class DbConfig(BaseModel):
     url: str
+    pool: bool = Field(default=False)
+    max_connections: int = Field(default=20)
+    stale_timeout: int = Field(default=300)
+    timeout: int = Field(default=10)
 
 
 class RedisConfig(BaseModel):
     url: str
 
+
+class QueueConfig(BaseModel):
+    backend: str = Field(default="memory")
+    visibility_timeout: int = Field(default=900)
+    weights: dict[str, int] = Field(default={"interactive": 4, "backfill": 1})
+    affinity_window: int = Field(default=8)
+    max_depth: int = Field(default=0)
+    max_per_uid: int = Field(default=0)
+    retry_after: int = Field(default=30)
+    claim_retry: int = Field(default=60)
+
+class CacheConfig(BaseModel):
+    path: str = Field(default=(USER_CACHE_PATH / "s3").as_posix())
+    max_bytes: int = Field(default=2 * 1024**3)
+    verify: bool = Field(default=False)
+
+
+class FetchConfig(BaseModel):
+    connect_timeout: float = Field(default=5)
+    read_timeout: float = Field(default=20)
+    max_bytes: int = Field(default=20 * 1024**2)
+    max_pixels: int = Field(default=40_000_000)
+    max_connections: int = Field(default=20)
+    workers: int = Field(default=4)
+
+
 class FirebaseConfig(BaseModel):
     admin_json: str
     db: str
@@ -46,6 +77,11 @@ class ApiConfig(BaseModel):
     workers: Optional[int] = Field(default=1)
     web_host: Optional[str] = Field(default="https://face-api.cacko.net")
     loop: str = Field(default="auto")
+    generators: int = Field(default=1)
+    defer_renditions: bool = Field(default=False)
+    single_flight: str = Field(default="local")
+    single_flight_timeout: int = Field(default=120)
+    ingest_timeout: int = Field(default=600)
 
 
 class AWSConfig(BaseModel):
@@ -55,11 +91,30 @@ class AWSConfig(BaseModel):
     s3_region: str
     storage_bucket_name: str
     media_location: str
+    upload_workers: int = Field(default=8)
+    endpoint_url: Optional[str] = Field(default=None)
+    max_pool_connections: int = Field(default=20)
+    multipart_threshold: int = Field(default=16 * 1024**2)
+    max_concurrency: int = Field(default=4)
+    immutable_cache_control: str = Field(default="public, max-age=31536000, immutable")
+
+
+class MashaBackendConfig(BaseModel):
+    host: str
+    port: int
 
 
 class MashaConfig(BaseModel):
     host: str
     port: int
+    backends: list[MashaBackendConfig] = Field(default=[])
+    failure_threshold: int = Field(default=3)
+    reset_timeout: int = Field(default=30)
+    health_interval: int = Field(default=15)
+    connect_timeout: float = Field(default=5)
+    read_timeout: float = Field(default=600)
+    max_connections: int = Field(default=20)
+    max_keepalive_connections: int = Field(default=10)
 
 
 class YamlConfigSettingsSource(PydanticBaseSettingsSource):
@@ -79,6 +134,9 @@ class YamlConfigSettingsSource(PydanticBaseSettingsSource):
 class Settings(BaseSettings):
     db: DbConfig
     redis: RedisConfig
+    queue: QueueConfig = Field(default_factory=QueueConfig)
+    cache: CacheConfig = Field(default_factory=CacheConfig)
+    fetch: FetchConfig = Field(default_factory=FetchConfig)
     api: ApiConfig
     aws: AWSConfig
     firebase: FirebaseConfig
@@ -5,6 +5,7 @@ from fastapi import Response, UploadFile
 from corefile import TempPath
 import filetype
 from typing import Optional
+from faceapi.core.hashing import CHUNK_SIZE, HashingWriter
 
 
 def make_response(image_path: Optional[Path] = None, message: Optional[str] = None):
@@ -27,7 +28,10 @@ def make_multipart_response(image_path: Path, message: Optional[str] = None):
     return Response(m.to_string(), media_type=m.content_type)
 
 
-async def uploaded_file(file: UploadFile) -> Path:
+async def uploaded_file(file: UploadFile) -> tuple[Path, str]:
     tmp_path = TempPath(f"uploaded_file_{file.filename}")
-    tmp_path.write_bytes(await file.read())
-    return tmp_path
+    with tmp_path.open("wb") as fp:
+        writer = HashingWriter(fp)
+        while chunk := await file.read(CHUNK_SIZE):
+            writer.write(chunk)
+    return tmp_path, writer.hexdigest
@@ -0,0 +1,55 @@
+from typing import Optional
+from redis import Redis
+from corestring import string_hash, to_int
+from faceapi.config import app_config
+from faceapi.database.models import Image, Prompt
+
+
+class ResultCacheMeta(type):
+    _instance: Optional["ResultCache"] = None
+
+    def __call__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = type.__call__(cls, *args, **kwargs)
+        return cls._instance
+
+    def is_deterministic(cls, prompt: Prompt) -> bool:
+        return to_int(prompt.seed, -1) != -1
+
+    def get(cls, source: Image, prompt: Prompt) -> Optional[Image]:
+        return cls().get_result(source, prompt)
+
+    def set(cls, source: Image, prompt: Prompt, image: Image):
+        return cls().set_result(source, prompt, image)
+
+    @property
+    def stats(cls) -> dict[str, int]:
+        return cls().get_stats()
+
+
+class ResultCache(object, metaclass=ResultCacheMeta):
+
+    def __init__(self) -> None:
+        self._redis = Redis.from_url(app_config.redis.url)
+        self._results = "faceapi:results"
+        self._stats = "faceapi:results:stats"
+
+    def key(self, source: Image, prompt: Prompt) -> str:
+        return string_hash(f"{source.hash}-{prompt.hash}")
+
+    def get_result(self, source: Image, prompt: Prompt) -> Optional[Image]:
+        key = self.key(source, prompt)
+        image_id = self._redis.hget(self._results, key)
+        image = Image.fetch(Image.id == int(image_id)) if image_id else None
+        if image_id and not image:
+            # the image was reclaimed by clean
+            self._redis.hdel(self._results, key)
+        self._redis.hincrby(self._stats, "hit" if image else "miss", 1)
+        return image
+
+    def set_result(self, source: Image, prompt: Prompt, image: Image):
+        self._redis.hset(self._results, self.key(source, prompt), image.id)
+
+    def get_stats(self) -> dict[str, int]:
+        stats = self._redis.hgetall(self._stats)
+        return {k.decode(): int(v) for k, v in stats.items()}
@@ -2,4 +2,5 @@ from enum import StrEnum
 
 class Command(StrEnum):
     
-    GENERATE="generate"
\ No newline at end of file
+    GENERATE="generate"
+    REGENERATE="regenerate"
\ No newline at end of file
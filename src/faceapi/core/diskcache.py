@@ -0,0 +1,133 @@
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+from io import BytesIO
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+from uuid import uuid4
+from faceapi.config import app_config
+from faceapi.core.hashing import CHUNK_SIZE
+
+
+class DiskCacheMeta(type):
+    _instance: Optional["DiskCache"] = None
+
+    def __call__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = type.__call__(cls, *args, **kwargs)
+        return cls._instance
+
+    def fetch(cls, key: str, loader: Callable[[Path], Path]) -> Path:
+        return cls().get_or_load(key, loader)
+
+    def put(cls, key: str, src: Path | BytesIO) -> Path:
+        return cls().store(key, src)
+
+    @property
+    def stats(cls) -> dict[str, float]:
+        return cls().get_stats()
+
+
+class DiskCache(object, metaclass=DiskCacheMeta):
+
+    def __init__(self) -> None:
+        cfg = app_config.cache
+        self.root = Path(cfg.path)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = cfg.max_bytes
+        self.verify = cfg.verify
+        self.__lock_path = self.root / ".lock"
+        self.__mutex = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key: str) -> Path:
+        return self.root / Path(key).name
+
+    def sidecar(self, path: Path) -> Path:
+        return path.with_name(f"{path.name}.sha256")
+
+    def digest(self, path: Path) -> str:
+        digest = hashlib.sha256()
+        with path.open("rb") as fp:
+            while chunk := fp.read(CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def is_valid(self, path: Path) -> bool:
+        try:
+            size, digest = self.sidecar(path).read_text().split()
+            assert path.stat().st_size == int(size)
+            assert not self.verify or self.digest(path) == digest
+            return True
+        except (AssertionError, FileNotFoundError, ValueError):
+            return False
+
+    def get_or_load(self, key: str, loader: Callable[[Path], Path]) -> Path:
+        path = self.path(key)
+        try:
+            assert self.is_valid(path)
+            os.utime(path)
+            with self.__mutex:
+                self.hits += 1
+            return path
+        except (AssertionError, FileNotFoundError):
+            pass
+        with self.__mutex:
+            self.misses += 1
+        return self.store(key, loader)
+
+    def store(self, key: str, src: Path | BytesIO | Callable[[Path], Path]) -> Path:
+        path = self.path(key)
+        part = path.with_name(f".{path.name}.{uuid4().hex}.part")
+        try:
+            match src:
+                case BytesIO():
+                    part.write_bytes(src.getbuffer())
+                case Path():
+                    try:
+                        os.link(src, part)
+                    except OSError:
+                        shutil.copyfile(src, part)
+                case _:
+                    src(part)
+            meta = part.with_name(f"{part.name}.sha256")
+            meta.write_text(f"{part.stat().st_size} {self.digest(part)}")
+            os.replace(meta, self.sidecar(path))
+            os.replace(part, path)
+        finally:
+            part.unlink(missing_ok=True)
+        self.evict()
+        return path
+
+    def evict(self):
+        with self.__lock_path.open("w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = []
+            for pth in self.root.iterdir():
+                if pth.name.startswith(".") or pth.suffix == ".sha256":
+                    continue
+                try:
+                    st = pth.stat()
+                    entries.append((st.st_mtime, st.st_size, pth))
+                except FileNotFoundError:
+                    pass
+            total = sum(size for _, size, _ in entries)
+            for _, size, pth in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                logging.debug(f"cache evict {pth.name}")
+                pth.unlink(missing_ok=True)
+                self.sidecar(pth).unlink(missing_ok=True)
+                total -= size
+
+    def get_stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            hit_rate=self.hits / total if total else 0.0,
+        )
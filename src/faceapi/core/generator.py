@@ -1,6 +1,6 @@
 import logging
 import time
-from corestring import file_hash
+from faceapi.core.hashing import content_hash
 from faceapi.database.database import Database
 from faceapi.database.enums import ImageType, Status
 from faceapi.database import Generated, Image, Prompt
@@ -10,6 +10,10 @@ from corethread import StoppableThread
 from corestring import to_int
 
 from faceapi.masha.models import APIError
+from faceapi.core.cache import ResultCache
+from faceapi.core.commands import Command
+from faceapi.config import app_config
+from playhouse.signals import post_save
 
 class Generator(StoppableThread):
 
@@ -20,27 +24,47 @@ class Generator(StoppableThread):
     def run(self):
         while not self.stopped():
             try:
-                _, payload = self.queue.get()
-                self.__generate(slug=payload)
-                self.queue.task_done()
+                cmd, payload = self.queue.get(timeout=1)
             except Empty:
-                time.sleep(1)
+                continue
+            try:
+                with Database.checkout():
+                    self.__generate(slug=payload, cached=cmd != Command.REGENERATE)
             except Exception as e:
                 logging.exception(e)
                 time.sleep(2)
-                
+            finally:
+                self.queue.task_done()
+                logging.debug(f"queue stats {self.queue.stats}")
 
-    def __generate(self, slug: str):
+
+    def __generate(self, slug: str, cached: bool = True):
         try:
+            with Database.db.atomic():
+                claimed = Generated.claim(
+                    slug, stale_after=app_config.queue.visibility_timeout
+                )
+            if not claimed:
+                current = Generated.get_or_none(Generated.slug == slug)
+                if current and current.Status == Status.IN_PROGRESS:
+                    delay = app_config.queue.claim_retry
+                    logging.info(f"{slug} is in progress by another worker, retry in {delay}s")
+                    self.queue.retry(delay)
+                return
             item: Generated = (
                 Generated.select(Generated)
                 .where((Generated.slug == slug))
                 .get()
             )
-            with Database.db.atomic():
-                item.Status = Status.IN_PROGRESS
-                item.save(only=["Status"])
+            post_save.send(item, created=False)
             prompt: Prompt = item.prompt
+            deterministic = ResultCache.is_deterministic(prompt)
+            if cached and deterministic:
+                if img := ResultCache.get(item.source, prompt):
+                    logging.info(f"{slug} result cache hit")
+                    item.image = img
+                    item.Status = Status.GENERATED
+                    return item.save(only=["image", "Status"])
             client = Face2Img(
                 img_path=item.source.tmp_path,
                 template=prompt.template,
@@ -64,8 +88,10 @@ class Generator(StoppableThread):
             img, _ = Image.get_or_create(
                 Type=ImageType.GENERATED,
                 Image=result_path.as_posix(),
-                hash=file_hash(result_path),
+                hash=client.attachment_hash or content_hash(result_path),
             )
+            if deterministic:
+                ResultCache.set(item.source, prompt, img)
             item.image = img
             item.Status = Status.GENERATED
             return item.save(only=["image", "Status", "prompt"])
@@ -79,3 +105,23 @@ class Generator(StoppableThread):
             item.error = str(e.__cause__)
             item.Status = Status.ERROR
             return item.save(only=["error", "Status"])
+
+
+class GeneratorPool(object):
+
+    def __init__(self, queue: Queue, size: int = 1):
+        self.workers = [
+            Generator(queue=queue, name=f"generator-{idx}", daemon=True)
+            for idx in range(max(1, size))
+        ]
+
+    def start(self):
+        logging.info(f">> GENERATOR POOL start {len(self.workers)} workers")
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self, timeout: float = 5):
+        for worker in self.workers:
+            worker.stop()
+        for worker in self.workers:
+            worker.join(timeout=timeout)
@@ -0,0 +1,51 @@
+import hashlib
+import os
+from functools import lru_cache
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import BinaryIO, Optional
+from corestring import file_hash
+
+CHUNK_SIZE = 1 << 16
+ALGORITHMS = ("md5", "sha1", "sha256", "sha224", "sha384", "sha512", "blake2b", "blake2s")
+
+
+@lru_cache(maxsize=None)
+def algorithm() -> Optional[str]:
+    # Image.hash, and through it Generated slugs and ResultCache keys, is
+    # corestring's file_hash; find the hashlib digest behind it so ingest
+    # paths can compute the same value while the bytes stream through
+    sample = os.urandom(CHUNK_SIZE * 3 + 1)
+    with NamedTemporaryFile() as fp:
+        fp.write(sample)
+        fp.flush()
+        expected = file_hash(Path(fp.name))
+    return next(
+        (a for a in ALGORITHMS if hashlib.new(a, sample).hexdigest() == expected),
+        None,
+    )
+
+
+class HashingWriter(object):
+
+    def __init__(self, fp: BinaryIO):
+        self.fp = fp
+        name = algorithm()
+        self.__hash = hashlib.new(name) if name else None
+
+    def write(self, data: bytes) -> int:
+        if self.__hash:
+            self.__hash.update(data)
+        return self.fp.write(data)
+
+    @property
+    def hexdigest(self) -> str:
+        if self.__hash:
+            return self.__hash.hexdigest()
+        if not self.fp.closed:
+            self.fp.flush()
+        return file_hash(Path(self.fp.name))
+
+
+def content_hash(path: Path) -> str:
+    return file_hash(path)
@@ -1,19 +1,91 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Optional
 from PIL import Image
 from corefile import TempPath
 import httpx
 import logging
+from faceapi.config import app_config
+
+
+class ImageFetchError(Exception):
+    pass
+
+
+class ImageFetcherMeta(type):
+    _instance: Optional["ImageFetcher"] = None
+
+    def __call__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = type.__call__(cls, *args, **kwargs)
+        return cls._instance
+
+    async def close(cls):
+        if cls._instance:
+            await cls._instance.aclose()
+            cls._instance = None
+
+
+class ImageFetcher(object, metaclass=ImageFetcherMeta):
+
+    def __init__(self) -> None:
+        cfg = app_config.fetch
+        self.max_bytes = cfg.max_bytes
+        self.max_pixels = cfg.max_pixels
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(cfg.read_timeout, connect=cfg.connect_timeout),
+            limits=httpx.Limits(max_connections=cfg.max_connections),
+            follow_redirects=True,
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=cfg.workers, thread_name_prefix="image-fetch"
+        )
+
+    async def aclose(self):
+        await self._client.aclose()
+        self._executor.shutdown(wait=False)
+
+    async def fetch(self, url: str, dst: Path):
+        try:
+            async with self._client.stream("GET", url) as r:
+                r.raise_for_status()
+                length = int(r.headers.get("content-length", 0))
+                if length > self.max_bytes:
+                    raise ImageFetchError(f"{url} is larger than {self.max_bytes} bytes")
+                size = 0
+                with dst.open("wb") as out_file:
+                    async for chunk in r.aiter_bytes():
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            raise ImageFetchError(
+                                f"{url} is larger than {self.max_bytes} bytes"
+                            )
+                        out_file.write(chunk)
+        except httpx.HTTPError as e:
+            raise ImageFetchError(f"fetching {url} failed: {e}")
+
+    def resize(self, pth: Path, resize: bool):
+        try:
+            with Image.open(pth.as_posix()) as img:
+                width, height = img.size
+                if width * height > self.max_pixels:
+                    raise ImageFetchError(f"{width}x{height} exceeds {self.max_pixels} pixels")
+                if resize:
+                    img.thumbnail((1024, 1024))
+                    img.save(pth.as_posix(), format=img.format)
+        except (Image.UnidentifiedImageError, Image.DecompressionBombError) as e:
+            raise ImageFetchError(str(e))
+
+    async def download(self, url: str, resize=True) -> TempPath:
+        url_path = Path(url)
+        tmp_file = TempPath(f"uploaded_file_{url_path.name}")
+        await self.fetch(url, tmp_file)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.resize, tmp_file, resize)
+        logging.debug(f"fetched {url} to {tmp_file}")
+        return tmp_file
+
 
 async def download_image(url: str, resize=True) -> TempPath:
-    client = httpx.AsyncClient()
-    url_path = Path(url)
-    tmp_file = TempPath(f"uploaded_file_{url_path.name}")
-    async with client.stream("GET", url) as r:
-        with tmp_file.open("wb") as out_file:
-            async for chunk in r.aiter_raw():
-                n = out_file.write(chunk)
-    if resize:
-        img = Image.open(tmp_file.as_posix())
-        img.thumbnail((1024,1024))
-        img.save(tmp_file.as_posix())
-    return tmp_file
\ No newline at end of file
+    return await ImageFetcher().download(url, resize)
@@ -1,8 +1,12 @@
 import logging
+from pathlib import Path
 
 from faceapi.core.commands import Command
-from faceapi.core.queue import GeneratorQueue
+from faceapi.core.queue import GeneratorQueue, Priority
+from faceapi.database.database import Database
 from faceapi.database.models.generated import Generated
+from faceapi.database.models.image import Image
+from faceapi.database.models.prompt import Prompt
 from faceapi.firebase.db import OptionsDb, AccessDb
 from faceapi.masha.face2img import Face2ImgOptions
 from faceapi.config import app_config
@@ -22,11 +26,36 @@ def update_access():
 
 
 def resume_generations():
-
-    base_query = Generated.select()
+    released = Generated.release_stale(
+        stale_after=app_config.queue.visibility_timeout
+    )
+    logging.info(f"{released} stale generations reset to pending")
+    base_query = Generated.select(Generated, Prompt).join(Prompt)
     query = base_query.where(
         Generated.Status.in_([Status.PENDING, Status.IN_PROGRESS])
     ).order_by(Generated.last_modified.asc())
     for record in query:
-        GeneratorQueue().put_nowait((Command.GENERATE, record.slug))
-
+        GeneratorQueue().put_nowait(
+            (Command.GENERATE, record.slug),
+            uid=record.uid,
+            priority=Priority.BACKFILL,
+            affinity=record.prompt.affinity,
+        )
+
+
+@Database.connection
+def resume_renditions():
+    query = (
+        Image.select()
+        .where(Image.ready == False)
+        .order_by(Image.last_modified.asc())
+    )
+    for image in query.iterator():
+        if not Image.claim_stale(image.id, app_config.api.ingest_timeout):
+            continue
+        try:
+            image_path = image.tmp_path
+        except Exception as e:
+            logging.warning(f"{image.hash} raw rendition unavailable: {e}")
+            continue
+        image.render_deferred(image_path, Path(image.Image).stem)
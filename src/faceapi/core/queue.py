@@ -1,15 +1,414 @@
-from queue import Queue
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from enum import StrEnum
+from itertools import cycle
+from queue import Empty, Queue
+from typing import Any, Iterator, Optional
+from redis import Redis
+from faceapi.config import app_config
+from faceapi.core.commands import Command
+
+
+class QueueBackend(StrEnum):
+    MEMORY = "memory"
+    REDIS = "redis"
+
+
+class Priority(StrEnum):
+    INTERACTIVE = "interactive"
+    BACKFILL = "backfill"
+
+
+THROUGHPUT_WINDOW = 300
+
+
+def priority_cycle(weights: dict[str, int]) -> Iterator[Priority]:
+    order = [p for p in Priority for _ in range(max(1, weights.get(p.value, 1)))]
+    return cycle(order)
+
+
+def estimated_wait(depth: int, throughput: float) -> Optional[float]:
+    try:
+        assert throughput > 0
+        return depth / throughput
+    except AssertionError:
+        return None
+
+
+class FairScheduler(object):
+
+    def __init__(self, weights: dict[str, int], window: int = 0):
+        self._classes: dict[Priority, OrderedDict[str, deque]] = {
+            p: OrderedDict() for p in Priority
+        }
+        self._cycle = priority_cycle(weights)
+        self._size = 0
+        self._window = window
+        self._affinity: Optional[str] = None
+        self._skips = 0
+        self.stats = dict(dispatched=0, swaps=0, swaps_saved=0)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def push(self, item: Any, uid: str, priority: Priority, affinity: str = ""):
+        users = self._classes[priority]
+        users.setdefault(uid, deque()).append((item, affinity))
+        self._size += 1
+
+    def __pick(self, users: OrderedDict[str, deque]) -> str:
+        head = next(iter(users))
+        if self._affinity is None or self._skips >= self._window:
+            return head
+        for idx, (uid, items) in enumerate(users.items()):
+            if idx >= self._window:
+                break
+            if items[0][1] == self._affinity:
+                return uid
+        return head
+
+    def pop(self) -> Any:
+        priority = next(self._cycle)
+        if not self._classes[priority]:
+            priority = next(p for p in Priority if self._classes[p])
+        users = self._classes[priority]
+        head = next(iter(users))
+        head_affinity = users[head][0][1]
+        uid = self.__pick(users)
+        items = users.pop(uid)
+        item, affinity = items.popleft()
+        if items:
+            users[uid] = items
+        self._size -= 1
+        self.__record(uid != head, head_affinity, affinity)
+        return item
+
+    def __record(self, skipped: bool, head_affinity: str, affinity: str):
+        self._skips = self._skips + 1 if skipped else 0
+        self.stats["dispatched"] += 1
+        if self._affinity is not None and affinity != self._affinity:
+            self.stats["swaps"] += 1
+        if skipped and head_affinity != self._affinity:
+            self.stats["swaps_saved"] += 1
+        self._affinity = affinity
+
+
+FAIR_POP = """
+local window = tonumber(ARGV[2])
+local last = redis.call('GET', KEYS[1] .. ':affinity')
+local skips = tonumber(redis.call('GET', KEYS[1] .. ':skips') or '0')
+for i = 3, #ARGV do
+    local uids = KEYS[1] .. ':' .. ARGV[i] .. ':uids'
+    local candidates = redis.call('LRANGE', uids, 0, math.max(window, 1) - 1)
+    if #candidates > 0 then
+        local head = candidates[1]
+        local prefix = KEYS[1] .. ':' .. ARGV[i] .. ':u:'
+        local head_affinity = cjson.decode(redis.call('LINDEX', prefix .. head, 0))[5]
+        local uid = head
+        if last and skips < window then
+            for _, candidate in ipairs(candidates) do
+                local job = cjson.decode(redis.call('LINDEX', prefix .. candidate, 0))
+                if job[5] == last then
+                    uid = candidate
+                    break
+                end
+            end
+        end
+        redis.call('LREM', uids, 1, uid)
+        local jobs = prefix .. uid
+        local raw = redis.call('LPOP', jobs)
+        if redis.call('LLEN', jobs) > 0 then
+            redis.call('RPUSH', uids, uid)
+        end
+        local affinity = cjson.decode(raw)[5]
+        local stats = KEYS[1] .. ':stats'
+        redis.call('HINCRBY', stats, 'dispatched', 1)
+        if last and affinity ~= last then
+            redis.call('HINCRBY', stats, 'swaps', 1)
+        end
+        if uid ~= head then
+            redis.call('INCR', KEYS[1] .. ':skips')
+            if head_affinity ~= last then
+                redis.call('HINCRBY', stats, 'swaps_saved', 1)
+            end
+        else
+            redis.call('SET', KEYS[1] .. ':skips', 0)
+        end
+        redis.call('SET', KEYS[1] .. ':affinity', affinity)
+        redis.call('ZADD', KEYS[2], ARGV[1], raw)
+        redis.call('DECR', KEYS[1] .. ':size')
+        return raw
+    end
+end
+return false
+"""
+
+FAIR_PUSH = """
+local job = cjson.decode(ARGV[1])
+local uids = KEYS[1] .. ':' .. job[4] .. ':uids'
+local jobs = KEYS[1] .. ':' .. job[4] .. ':u:' .. job[3]
+if redis.call('LLEN', jobs) == 0 then
+    redis.call('RPUSH', uids, job[3])
+end
+redis.call('RPUSH', jobs, ARGV[1])
+redis.call('INCR', KEYS[1] .. ':size')
+redis.call('LPUSH', KEYS[1] .. ':signal', 1)
+redis.call('LTRIM', KEYS[1] .. ':signal', 0, 0)
+"""
+
+REQUEUE_EXPIRED = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, raw in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], raw)
+    local job = cjson.decode(raw)
+    local uids = KEYS[1] .. ':' .. job[4] .. ':uids'
+    local jobs = KEYS[1] .. ':' .. job[4] .. ':u:' .. job[3]
+    if redis.call('LLEN', jobs) == 0 then
+        redis.call('LPUSH', uids, job[3])
+    end
+    redis.call('LPUSH', jobs, raw)
+    redis.call('INCR', KEYS[1] .. ':size')
+end
+return #expired
+"""
+
+
+class RedisQueue(object):
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        visibility_timeout: int = 900,
+        weights: dict[str, int] = {},
+        window: int = 0,
+    ):
+        self._redis = Redis.from_url(url)
+        self._name = name
+        self._inflight = f"{name}:inflight"
+        self._leases = f"{name}:leases"
+        self._signal = f"{name}:signal"
+        self._size = f"{name}:size"
+        self._done = f"{name}:done"
+        self._visibility_timeout = visibility_timeout
+        self._cycle = priority_cycle(weights)
+        self._window = window
+        self._pop = self._redis.register_script(FAIR_POP)
+        self._push = self._redis.register_script(FAIR_PUSH)
+        self._requeue = self._redis.register_script(REQUEUE_EXPIRED)
+        self._local = threading.local()
+
+    @staticmethod
+    def encode(item: tuple[Command, str], *extra: str) -> str:
+        cmd, payload = item
+        return json.dumps([cmd.value, payload, *extra])
+
+    @staticmethod
+    def decode(raw: bytes) -> tuple[Command, str]:
+        cmd, payload, *_ = json.loads(raw)
+        return Command(cmd), payload
+
+    def requeue_expired(self) -> int:
+        return self._requeue(
+            keys=[self._name, self._leases],
+            args=[time.time()],
+        )
+
+    def put(
+        self,
+        item: tuple[Command, str],
+        block=True,
+        timeout=None,
+        uid: str = "",
+        priority: Priority = Priority.INTERACTIVE,
+        affinity: str = "",
+    ) -> bool:
+        _, slug = item
+        if not self._redis.sadd(self._inflight, slug):
+            return False
+        self._push(
+            keys=[self._name],
+            args=[self.encode(item, uid, Priority(priority).value, affinity)],
+        )
+        return True
+
+    def put_nowait(self, item: tuple[Command, str], **kwds) -> bool:
+        return self.put(item, block=False, **kwds)
+
+    def __pop(self) -> Optional[bytes]:
+        first = next(self._cycle)
+        order = [first.value, *[p.value for p in Priority if p != first]]
+        return self._pop(
+            keys=[self._name, self._leases],
+            args=[time.time() + self._visibility_timeout, self._window, *order],
+        )
+
+    def get(self, block=True, timeout: Optional[float] = None) -> tuple[Command, str]:
+        self.requeue_expired()
+        deadline = time.time() + timeout if timeout else None
+        raw = self.__pop()
+        while raw is None and block:
+            wait = 1.0 if deadline is None else deadline - time.time()
+            if wait <= 0:
+                break
+            self._redis.blpop([self._signal], timeout=min(wait, 1.0))
+            raw = self.__pop()
+        if raw is None:
+            raise Empty
+        self._local.current = raw
+        return self.decode(raw)
+
+    def get_nowait(self) -> tuple[Command, str]:
+        return self.get(block=False)
+
+    def task_done(self):
+        raw = getattr(self._local, "current", None)
+        if raw is None:
+            return
+        now = time.time()
+        pipe = self._redis.pipeline()
+        pipe.zrem(self._leases, raw)
+        pipe.srem(self._inflight, self.decode(raw)[1])
+        pipe.zadd(self._done, {f"{now}:{raw.decode()}": now})
+        pipe.zremrangebyscore(self._done, "-inf", now - THROUGHPUT_WINDOW)
+        pipe.execute()
+        self._local.current = None
+
+    def retry(self, delay: float):
+        raw = getattr(self._local, "current", None)
+        if raw is None:
+            return
+        # keep the slug inflight and push the lease out, requeue_expired
+        # hands the job back once it lapses
+        self._redis.zadd(self._leases, {raw: time.time() + delay}, xx=True)
+        self._local.current = None
+
+    def qsize(self) -> int:
+        return int(self._redis.get(self._size) or 0)
+
+    def throughput(self) -> float:
+        now = time.time()
+        done = self._redis.zcount(self._done, now - THROUGHPUT_WINDOW, now)
+        return done / THROUGHPUT_WINDOW
+
+    def estimated_wait(self) -> Optional[float]:
+        return estimated_wait(self.qsize(), self.throughput())
+
+    @property
+    def stats(self) -> dict[str, int]:
+        stats = self._redis.hgetall(f"{self._name}:stats")
+        return {k.decode(): int(v) for k, v in stats.items()}
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
 
 class QueueMeta(type):
-    
-    __instances: dict[str, Queue] = {}
-    
+
+    __instances: dict[str, Any] = {}
+
     def __call__(cls, *args, **kwds):
         k = cls.__name__
         if k not in cls.__instances:
-            cls.__instances[k] = type.__call__(cls, *args, **kwds)
+            match app_config.queue.backend:
+                case QueueBackend.REDIS:
+                    cls.__instances[k] = RedisQueue(
+                        name=f"faceapi:{k}",
+                        url=app_config.redis.url,
+                        visibility_timeout=app_config.queue.visibility_timeout,
+                        weights=app_config.queue.weights,
+                        window=app_config.queue.affinity_window,
+                    )
+                case _:
+                    cls.__instances[k] = type.__call__(cls, *args, **kwds)
         return cls.__instances[k]
-        
+
 
 class GeneratorQueue(Queue, metaclass=QueueMeta):
-    pass
\ No newline at end of file
+
+    def __init__(self, maxsize: int = 0):
+        super().__init__(maxsize)
+        self._inflight: set[str] = set()
+        self._local = threading.local()
+        self._done: deque[float] = deque()
+
+    def _init(self, maxsize):
+        self.queue = FairScheduler(
+            weights=app_config.queue.weights,
+            window=app_config.queue.affinity_window,
+        )
+
+    def _qsize(self):
+        return len(self.queue)
+
+    def _put(self, job):
+        _, uid, priority, affinity = job
+        self.queue.push(job, uid=uid, priority=priority, affinity=affinity)
+
+    def _get(self):
+        return self.queue.pop()
+
+    def put(
+        self,
+        item: tuple[Command, str],
+        block=True,
+        timeout=None,
+        uid: str = "",
+        priority: Priority = Priority.INTERACTIVE,
+        affinity: str = "",
+    ) -> bool:
+        _, slug = item
+        with self.mutex:
+            if slug in self._inflight:
+                return False
+            self._inflight.add(slug)
+        try:
+            super().put((item, uid, Priority(priority), affinity), block, timeout)
+        except Exception:
+            with self.mutex:
+                self._inflight.discard(slug)
+            raise
+        return True
+
+    def put_nowait(self, item: tuple[Command, str], **kwds) -> bool:
+        return self.put(item, block=False, **kwds)
+
+    def get(self, block=True, timeout: Optional[float] = None) -> tuple[Command, str]:
+        job = super().get(block, timeout)
+        self._local.current = job
+        return job[0]
+
+    @property
+    def stats(self) -> dict[str, int]:
+        with self.mutex:
+            return dict(self.queue.stats)
+
+    def task_done(self):
+        job = getattr(self._local, "current", None)
+        if job is not None:
+            with self.mutex:
+                self._inflight.discard(job[0][1])
+                self._done.append(time.time())
+            self._local.current = None
+        super().task_done()
+
+    def retry(self, delay: float):
+        job = getattr(self._local, "current", None)
+        if job is None:
+            return
+        self._local.current = None
+        timer = threading.Timer(delay, super().put, args=(job,))
+        timer.daemon = True
+        timer.start()
+
+    def throughput(self) -> float:
+        horizon = time.time() - THROUGHPUT_WINDOW
+        with self.mutex:
+            while self._done and self._done[0] < horizon:
+                self._done.popleft()
+            return len(self._done) / THROUGHPUT_WINDOW
+
+    def estimated_wait(self) -> Optional[float]:
+        return estimated_wait(self.qsize(), self.throughput())
@@ -0,0 +1,99 @@
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Iterator
+from peewee import SQL, NodeList, fn
+from faceapi.config import app_config
+from faceapi.core.s3 import S3
+from faceapi.database import Generated, Image
+
+DELETE_BATCH_SIZE = 1000
+
+
+def sort_key(name: str) -> str:
+    # stems never contain ".", so "<stem>." orders the same way as the full
+    # name in byte order, which is how S3 lists keys
+    return f"{name.split('.')[0]}."
+
+
+def referenced_stems(horizon: datetime) -> Iterator[str]:
+    # content-addressed uploads skip existing keys, so an old object can be
+    # claimed by a fresh Image row before any Generated points at it
+    key = fn.CONCAT(fn.SPLIT_PART(Image.Image, ".", 1), ".")
+    query = (
+        Image.select(key)
+        .where(
+            Image.id.in_(Generated.select(Generated.image))
+            | Image.id.in_(Generated.select(Generated.source))
+            | (Image.last_modified > horizon)
+        )
+        .order_by(NodeList((key, SQL('COLLATE "C"'))))
+        .tuples()
+    )
+    for (stem,) in query.iterator():
+        yield stem
+
+
+def stored_objects(horizon: datetime) -> Iterator[tuple[str, str]]:
+    prefix = f"{app_config.aws.media_location}/"
+    for obj in S3.iter_objects(prefix):
+        if obj["LastModified"] > horizon:
+            continue
+        key = obj["Key"]
+        name = key[len(prefix):]
+        if "/" in name:
+            continue
+        yield sort_key(name), key
+
+
+def orphan_images(horizon: datetime):
+    return (
+        Image.id.not_in(
+            Generated.select(Generated.image).where(Generated.image.is_null(False))
+        )
+        & Image.id.not_in(Generated.select(Generated.source))
+        & (Image.last_modified <= horizon)
+    )
+
+
+def orphans(horizon: datetime) -> Iterator[str]:
+    stems = referenced_stems(horizon)
+    current = next(stems, None)
+    for stem, key in stored_objects(horizon):
+        while current is not None and current < stem:
+            current = next(stems, None)
+        if current != stem:
+            yield key
+
+
+def batched(keys: Iterator[str], size: int) -> Iterator[list[str]]:
+    while batch := list(islice(keys, size)):
+        yield batch
+
+
+def reconcile(dry_run: bool = True, min_age: timedelta = timedelta(hours=1), workers: int = 4) -> int:
+    horizon = datetime.now(tz=timezone.utc) - min_age
+    # rows go first so nothing can link an image whose objects are deleted
+    if dry_run:
+        rows = Image.select().where(orphan_images(horizon)).count()
+    else:
+        rows = Image.delete().where(orphan_images(horizon)).execute()
+    logging.info(f"{rows} orphan images {'found' if dry_run else 'deleted'}")
+    total = 0
+    deleted = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for batch in batched(orphans(horizon), DELETE_BATCH_SIZE):
+            total += len(batch)
+            if dry_run:
+                for key in batch:
+                    logging.info(f"orphan {key}")
+                continue
+            if len(pending) >= workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                deleted += sum(len(f.result()) for f in done)
+            pending.add(pool.submit(S3.delete_many, batch))
+        deleted += sum(len(f.result()) for f in wait(pending).done)
+    logging.info(f"{total} orphans found, {0 if dry_run else deleted} deleted")
+    return total
@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+from PIL import Image
+from PIL.ImageOps import exif_transpose
+
+THUMBNAIL_SIZE = (300, 300)
+METADATA_KEYS = {"exif", "xmp", "XML:com.adobe.xmp", "comment"}
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    if not _executor:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="renditions")
+    return _executor
+
+
+class Rendition(object):
+
+    def __init__(self, suffix: str, data: Path | BytesIO):
+        self.suffix = suffix
+        self.data = data
+
+    def fname(self, stem: str) -> str:
+        return f"{stem}{self.suffix}"
+
+
+def encode(img: Image.Image, format: str) -> BytesIO:
+    buf = BytesIO()
+    img.save(buf, format=format)
+    buf.seek(0)
+    return buf
+
+
+def is_clean(img: Image.Image) -> bool:
+    # originals are published as-is only when there is no metadata to strip,
+    # re-encoding through PIL drops exif and xmp
+    return not img.getexif() and not METADATA_KEYS & set(img.info)
+
+
+def raw_rendition(image_path: Path) -> Rendition:
+    with Image.open(image_path.as_posix()) as img:
+        if is_clean(img):
+            return Rendition(".png", image_path)
+        format = img.format or "PNG"
+        img.load()
+    exif_transpose(img, in_place=True)
+    return Rendition(".png", encode(img, format))
+
+
+def renditions(image_path: Path, raw: bool = True) -> list[Rendition]:
+    with Image.open(image_path.as_posix()) as img:
+        clean = is_clean(img)
+        format = img.format or "PNG"
+        img.load()
+    exif_transpose(img, in_place=True)
+    result = []
+    if raw:
+        result.append(Rendition(".png", image_path if clean else encode(img, format)))
+    webp = encode(img, "WEBP")
+    img.thumbnail(THUMBNAIL_SIZE)
+    thumb = encode(img, "WEBP")
+    return [
+        *result,
+        Rendition(".webp", webp),
+        Rendition(".thumbnail.webp", thumb),
+    ]
@@ -1,7 +1,14 @@
 import boto3
+from concurrent.futures import ThreadPoolExecutor, wait
+from io import BytesIO
 from pathlib import Path
+from typing import Iterator, Optional
 
 import boto3.s3
+import threading
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from faceapi.config import app_config
 from corefile import TempPath
 import filetype
@@ -9,15 +16,62 @@ import logging
 
 
 class S3Meta(type):
+    _instance: Optional["S3"] = None
+    _executor: Optional[ThreadPoolExecutor] = None
+    _lock = threading.Lock()
+
     def __call__(cls, *args, **kwds):
-        return type.__call__(cls, *args, **kwds)
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = type.__call__(cls, *args, **kwds)
+        return cls._instance
+
+    @property
+    def executor(cls) -> ThreadPoolExecutor:
+        if not cls._executor:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=app_config.aws.upload_workers,
+                thread_name_prefix="s3-upload",
+            )
+        return cls._executor
 
-    def upload(cls, src: Path, dst: str, skip_upload: bool = False) -> str:
+    def upload(
+        cls,
+        src: Path | BytesIO,
+        dst: str,
+        skip_upload: bool = False,
+        immutable: bool = False,
+    ) -> str:
         logging.debug(f"upload {src} to {dst}")
-        return cls().upload_file(src, dst, skip_upload)
-    
-    def download(cls, key: str) -> Path:
-        return cls().download_file(cls.src_key(key))
+        return cls().upload_file(src, dst, skip_upload, immutable)
+
+    def upload_many(
+        cls, files: list[tuple[Path | BytesIO, str]], immutable: bool = False
+    ) -> list[str]:
+        futures = {
+            cls.executor.submit(cls.upload, src, dst, immutable=immutable): dst
+            for src, dst in files
+        }
+        wait(futures)
+        failed = [f for f in futures if f.exception()]
+        try:
+            assert not failed
+            return [f.result() for f in futures]
+        except AssertionError:
+            if immutable:
+                # content-addressed keys may be shared, leave them to clean
+                raise failed[0].exception()
+            for future, dst in futures.items():
+                if not future.exception():
+                    try:
+                        cls.delete(dst)
+                    except Exception as e:
+                        logging.error(f"rollback of {dst} failed: {e}")
+            raise failed[0].exception()
+
+    def download(cls, key: str, dst: Optional[Path] = None) -> Path:
+        return cls().download_file(cls.src_key(key), dst)
 
     def delete(cls, key: str):
         return cls().delete_file(cls.src_key(key))
@@ -25,6 +79,12 @@ class S3Meta(type):
     def src_key(cls, dst):
         return f"{app_config.aws.media_location}/{dst}"
     
+    def iter_objects(cls, prefix: str) -> Iterator[dict]:
+        return cls().iter_files(prefix)
+
+    def delete_many(cls, keys: list[str]) -> list[str]:
+        return cls().delete_files(keys)
+
     def list(cls, dst):
         return cls().list_files(dst)
 
@@ -38,19 +98,55 @@ class S3(object, metaclass=S3Meta):
             aws_access_key_id=cfg.access_key_id,
             aws_secret_access_key=cfg.secret_access_key,
             region_name=cfg.s3_region,
+            endpoint_url=cfg.endpoint_url,
+            config=Config(max_pool_connections=cfg.max_pool_connections),
+        )
+        self._transfer = TransferConfig(
+            multipart_threshold=cfg.multipart_threshold,
+            max_concurrency=cfg.max_concurrency,
         )
 
-    def upload_file(self, src: Path, dst, skip_upload=False) -> str:
-        mime = filetype.guess_mime(src)
+    def exists(self, key: str) -> bool:
+        bucket = app_config.aws.storage_bucket_name
+        try:
+            self._client.head_object(Bucket=bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return False
+            raise e
+
+    def upload_file(
+        self, src: Path | BytesIO, dst, skip_upload=False, immutable=False
+    ) -> str:
         key = self.__class__.src_key(dst)
+        if immutable and not skip_upload and self.exists(key):
+            logging.debug(f"{key} exists, skipping upload")
+            skip_upload = True
         if not skip_upload:
             bucket = app_config.aws.storage_bucket_name
-            res = self._client.upload_file(
-                src,
-                bucket,
-                key,
-                ExtraArgs={"ContentType": mime, "ACL": "public-read"},
-            )
+            extra = {"ACL": "public-read"}
+            if immutable:
+                extra["CacheControl"] = app_config.aws.immutable_cache_control
+            match src:
+                case BytesIO():
+                    mime = filetype.guess_mime(src.getbuffer())
+                    res = self._client.upload_fileobj(
+                        src,
+                        bucket,
+                        key,
+                        ExtraArgs={"ContentType": mime, **extra},
+                        Config=self._transfer,
+                    )
+                case _:
+                    mime = filetype.guess_mime(src)
+                    res = self._client.upload_file(
+                        src,
+                        bucket,
+                        key,
+                        ExtraArgs={"ContentType": mime, **extra},
+                        Config=self._transfer,
+                    )
         return key
 
     def download_file(self, key: str, dst: Path = None) -> Path:
@@ -61,7 +157,8 @@ class S3(object, metaclass=S3Meta):
         res = self._client.download_file(
             Bucket=bucket,
             Key=key,
-            Filename=dst.as_posix()
+            Filename=dst.as_posix(),
+            Config=self._transfer,
         )
         return dst
 
@@ -73,4 +170,20 @@ class S3(object, metaclass=S3Meta):
     def list_files(self, pth: str):
         bucket = app_config.aws.storage_bucket_name
         ref = self._client.list_objects_v2(Bucket=bucket, Prefix=pth)
-        return[x for x in ref['Contents']]
\ No newline at end of file
+        return[x for x in ref['Contents']]
+
+    def iter_files(self, prefix: str) -> Iterator[dict]:
+        bucket = app_config.aws.storage_bucket_name
+        paginator = self._client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            yield from page.get("Contents", [])
+
+    def delete_files(self, keys: list[str]) -> list[str]:
+        bucket = app_config.aws.storage_bucket_name
+        res = self._client.delete_objects(
+            Bucket=bucket,
+            Delete={"Objects": [{"Key": k} for k in keys], "Quiet": True},
+        )
+        for err in res.get("Errors", []):
+            logging.error(f"delete {err.get('Key')} failed: {err.get('Message')}")
+        return [k for k in keys if k not in {e.get("Key") for e in res.get("Errors", [])}]
\ No newline at end of file
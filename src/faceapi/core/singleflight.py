@@ -0,0 +1,73 @@
+from contextlib import contextmanager
+from threading import Lock
+from typing import Optional
+from redis import Redis
+from faceapi.config import app_config
+import logging
+
+
+class SingleFlightMeta(type):
+    _instance: Optional["SingleFlight"] = None
+    _lock = Lock()
+
+    def __call__(cls, *args, **kwargs):
+        with cls._lock:
+            if not cls._instance:
+                cls._instance = type.__call__(cls, *args, **kwargs)
+        return cls._instance
+
+    def lock(cls, key: str):
+        return cls().acquire(key)
+
+
+class SingleFlight(object, metaclass=SingleFlightMeta):
+
+    def __init__(self) -> None:
+        self._guard = Lock()
+        self._flights: dict[str, list] = {}
+        self._timeout = app_config.api.single_flight_timeout
+        self._redis = (
+            Redis.from_url(app_config.redis.url)
+            if app_config.api.single_flight == "redis"
+            else None
+        )
+
+    def __enter_local(self, key: str) -> Lock:
+        with self._guard:
+            flight = self._flights.setdefault(key, [Lock(), 0])
+            flight[1] += 1
+        return flight[0]
+
+    def __leave_local(self, key: str):
+        with self._guard:
+            flight = self._flights[key]
+            flight[1] -= 1
+            if not flight[1]:
+                del self._flights[key]
+
+    @contextmanager
+    def acquire(self, key: str):
+        local = self.__enter_local(key)
+        try:
+            with local:
+                if not self._redis:
+                    yield
+                    return
+                remote = self._redis.lock(
+                    f"faceapi:flight:{key}",
+                    timeout=self._timeout,
+                    blocking_timeout=self._timeout,
+                )
+                acquired = remote.acquire()
+                if not acquired:
+                    logging.warning(f"single flight {key} timed out, proceeding")
+                try:
+                    yield
+                finally:
+                    if acquired:
+                        try:
+                            remote.release()
+                        except Exception as e:
+                            logging.warning(f"single flight {key} release: {e}")
+        finally:
+            self.__leave_local(key)
@@ -1,4 +1,7 @@
+from contextlib import nullcontext
+from functools import wraps
 from playhouse.db_url import parse
+from playhouse.pool import PooledPostgresqlDatabase
 from peewee import PostgresqlDatabase
 from playhouse.shortcuts import ReconnectMixin, OperationalError, InterfaceError
 from faceapi.config import app_config
@@ -14,6 +17,11 @@ class ReconnectingDB(ReconnectMixin, PostgresqlDatabase):
     )
 
 
+class ReconnectingPooledDB(ReconnectMixin, PooledPostgresqlDatabase):
+
+    reconnect_errors = ReconnectingDB.reconnect_errors
+
+
 class DatabaseMeta(type):
     _instance: Optional["Database"] = None
 
@@ -23,15 +31,40 @@ class DatabaseMeta(type):
         return cls._instance
 
     @property
-    def db(cls) -> ReconnectingDB:
+    def db(cls) -> ReconnectingDB | ReconnectingPooledDB:
         return cls().get_db()
 
+    def checkout(cls):
+        if not app_config.db.pool:
+            return nullcontext()
+        return cls.db.connection_context()
+
+    def connection(cls, func):
+        if not app_config.db.pool:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with cls.checkout():
+                return func(*args, **kwargs)
+
+        return wrapper
+
 
 class Database(object, metaclass=DatabaseMeta):
 
     def __init__(self):
-        parsed = parse(app_config.db.url)
-        self.__db = ReconnectingDB(**parsed)
+        cfg = app_config.db
+        parsed = parse(cfg.url)
+        if cfg.pool:
+            self.__db = ReconnectingPooledDB(
+                **parsed,
+                max_connections=cfg.max_connections,
+                stale_timeout=cfg.stale_timeout,
+                timeout=cfg.timeout,
+            )
+        else:
+            self.__db = ReconnectingDB(**parsed)
 
-    def get_db(self) -> ReconnectingDB:
+    def get_db(self) -> ReconnectingDB | ReconnectingPooledDB:
         return self.__db
@@ -1,11 +1,10 @@
 from numpy import mat
-from peewee import CharField, TextField, FieldAccessor
+from peewee import CharField, TextField
 from faceapi.core.s3 import S3
-from uuid import uuid4
+from faceapi.core.diskcache import DiskCache
 from pathlib import Path
-from corefile import TempPath
-from PIL import Image
-from PIL.ImageOps import exif_transpose
+from faceapi.core.renditions import Rendition, renditions, raw_rendition
+import logging
 from faceapi.routers.models import ImageResponse
 from faceapi.config import app_config
 from .enums import ImageType, Status
@@ -70,8 +69,6 @@ class StatusField(CharField):
 
 class ImageFieldMeta(type):
 
-    __downloaded: dict[str, Path] = {}
-
     def raw_src(cls, image_path: Path) -> str:
         stem = image_path.stem
         return f"{CDN_ROOT}/{stem}.png"
@@ -85,62 +82,36 @@ class ImageFieldMeta(type):
         return f"{CDN_ROOT}/{stem}.thumbnail.webp"
 
     def download(cls, key: str) -> Path:
-        try:
-            assert cls.__downloaded
-            dld: Path | None = cls.__downloaded.get(key)
-            assert dld
-            assert dld.exists()
-        except AssertionError:
-            cls.__downloaded[key] = S3.download(key)
-        return cls.__downloaded[key]
+        return DiskCache.fetch(key, lambda dst: S3.download(key, dst))
 
-    def to_response(cls, image: str, hash: str):
+    def stage(cls, raw: Rendition, stem: str):
+        try:
+            DiskCache.put(raw.fname(stem), raw.data)
+        except OSError as e:
+            logging.warning(f"staging {stem} failed: {e}")
+
+    def store(cls, image_path: Path, stem: str) -> bool:
+        if app_config.api.defer_renditions:
+            raw = raw_rendition(image_path)
+            cls.stage(raw, stem)
+            S3.upload(raw.data, raw.fname(stem), immutable=True)
+            return True
+        result = renditions(image_path)
+        cls.stage(result[0], stem)
+        S3.upload_many([(r.data, r.fname(stem)) for r in result], immutable=True)
+        return False
+
+    def to_response(cls, image: str, hash: str, ready: bool = True):
         pth = Path(image)
+        raw_src = cls.raw_src(pth)
         return ImageResponse(
-            thumb_src=cls.thumb_src(pth),
-            webp_src=cls.webp_src(pth),
-            raw_src=cls.raw_src(pth),
+            thumb_src=cls.thumb_src(pth) if ready else raw_src,
+            webp_src=cls.webp_src(pth) if ready else raw_src,
+            raw_src=raw_src,
             hash=hash,
+            ready=ready,
         )
 
 
-class ImageFieldAccessor(FieldAccessor):
-
-    def __get__(self, instance, instance_type=None):
-        if instance is not None:
-            return instance.__data__.get(self.name)
-        return self.field
-
-    def __set__(self, instance, value):
-        if "id" not in instance.__data__:
-            image_path = Path(value)
-            assert image_path.exists()
-            stem = uuid4().hex
-            
-            img = Image.open(image_path.as_posix())
-            img = exif_transpose(img)
-            img.save(image_path.as_posix())
-
-            raw_fname = f"{stem}.png"
-            S3.upload(image_path, raw_fname)
-
-            img = Image.open(image_path.as_posix())
-
-            webp_fname = f"{stem}.webp"
-            webp_path = TempPath(webp_fname)
-            img.save(webp_path.as_posix())
-            S3.upload(webp_path, webp_fname)
-
-            img.thumbnail((300, 300))
-            thumb_fname = f"{stem}.thumbnail.webp"
-            thumb_path = TempPath(thumb_fname)
-            img.save(thumb_path.as_posix())
-            S3.upload(thumb_path, thumb_fname)
-            value = webp_fname
-
-        instance.__data__[self.name] = value
-        instance._dirty.add(self.name)
-
-
 class ImageField(CharField, metaclass=ImageFieldMeta):
-    accessor_class = ImageFieldAccessor
+    pass
@@ -1,4 +1,4 @@
-from peewee import DoesNotExist
+from peewee import DoesNotExist, Field, Model as PeeweeModel
 from playhouse.signals import Model
 from playhouse.shortcuts import model_to_dict
 from humanfriendly.tables import format_robust_table
@@ -16,6 +16,26 @@ class DbModel(Model):
         except DoesNotExist:
             return None
 
+    @classmethod
+    def upsert(cls, conflict: Field, **data):
+        data = {k: v for k, v in data.items() if k in cls._meta.fields}
+        query = (
+            cls.insert(**data)
+            .on_conflict_ignore()
+            .returning(*cls._meta.sorted_fields)
+            .dicts()
+        )
+        row = next(iter(query.execute()), None)
+        if row is None:
+            return cls.get(conflict == data[conflict.name]), False
+        instance = cls(__no_default__=True)
+        instance.__data__.update(row)
+        instance._dirty.clear()
+        for name, value in data.items():
+            if isinstance(value, PeeweeModel) and row.get(name) == value.get_id():
+                instance.__rel__[name] = value
+        return instance, True
+
     def to_dict(self):
         return model_to_dict(self)
 
@@ -14,8 +14,8 @@ from faceapi.database.fields import (
 from peewee import (
     CharField,
     DateTimeField,
-    IntegrityError,
     ForeignKeyField,
+    JOIN,
 )
 import datetime
 from playhouse.signals import post_save
@@ -45,23 +45,55 @@ class Generated(DbModel):
 
     @classmethod
     def get_or_create(cls, **kwargs) -> tuple["Generated", bool]:
-        defaults = kwargs.pop("defaults", {})
-        query = cls.select()
-        slug = cls.get_slug(**kwargs)
-        query = query.where((cls.slug == slug))
-
-        try:
-            return query.get(), False
-        except cls.DoesNotExist:
-            try:
-                if defaults:
-                    kwargs.update(defaults)
-                return cls.create(**kwargs), True
-            except IntegrityError as exc:
-                try:
-                    return query.get(), False
-                except cls.DoesNotExist:
-                    raise exc
+        kwargs.update(kwargs.pop("defaults", {}))
+        kwargs["slug"] = cls.get_slug(**kwargs)
+        instance, created = cls.upsert(cls.slug, **kwargs)
+        if created:
+            post_save.send(instance, created=True)
+        return instance, created
+
+    @classmethod
+    def with_related(cls):
+        result = Image.alias()
+        source = Image.alias()
+        return (
+            cls.select(cls, Prompt, result, source)
+            .join(Prompt, on=(cls.prompt == Prompt.id), attr="prompt")
+            .switch(cls)
+            .join(result, JOIN.LEFT_OUTER, on=(cls.image == result.id), attr="image")
+            .switch(cls)
+            .join(source, on=(cls.source == source.id), attr="source")
+        )
+
+    @classmethod
+    def claim(cls, slug: str, stale_after: int) -> bool:
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        stale = now - datetime.timedelta(seconds=stale_after)
+        query = cls.update(Status=Status.IN_PROGRESS, last_modified=now).where(
+            (cls.slug == slug)
+            & (cls.Status != Status.GENERATED)
+            & ((cls.Status != Status.IN_PROGRESS) | (cls.last_modified < stale))
+        )
+        return query.execute() > 0
+
+    @classmethod
+    def release_stale(cls, stale_after: int) -> int:
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        stale = now - datetime.timedelta(seconds=stale_after)
+        query = cls.update(Status=Status.PENDING, last_modified=now).where(
+            (cls.Status == Status.IN_PROGRESS) & (cls.last_modified < stale)
+        )
+        return query.execute()
+
+    @classmethod
+    def mark_pending(cls, slug: str, stale_after: int) -> bool:
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        stale = now - datetime.timedelta(seconds=stale_after)
+        query = cls.update(Status=Status.PENDING, last_modified=now).where(
+            (cls.slug == slug)
+            & ((cls.Status != Status.IN_PROGRESS) | (cls.last_modified < stale))
+        )
+        return query.execute() > 0
 
     @classmethod
     def create(cls, **query):
@@ -84,9 +116,9 @@ class Generated(DbModel):
         return GeneratedReponse(
             slug=self.slug,
             uid=self.uid,
-            prompt=self.prompt.to_response() if self.prompt else None,
-            image=self.image.to_response() if self.image else None,
-            source=self.source.to_response() if self.source else None,
+            prompt=self.prompt.to_response() if self.prompt_id else None,
+            image=self.image.to_response() if self.image_id else None,
+            source=self.source.to_response() if self.source_id else None,
             last_modified=self.last_modified,
             status=self.Status,
             error=self.error,
@@ -99,6 +131,7 @@ class Generated(DbModel):
         order_by = ["-last_modified"]
         indexes = (
             (("uid", "slug", "last_modified"), False),
+            (("uid", "last_modified", "slug"), False),
             (("slug",), True),
         )
 
@@ -10,10 +10,14 @@ from peewee import (
     CharField,
     DateTimeField,
     BooleanField,
-    IntegrityError,
 )
 from faceapi.config import app_config
+from faceapi.core.renditions import renditions
+from faceapi.core.renditions import executor as rendition_executor
+from faceapi.core.s3 import S3
+from faceapi.core.singleflight import SingleFlight
 import datetime
+import logging
 
 
 class Image(DbModel):
@@ -21,32 +25,64 @@ class Image(DbModel):
     Type = ImageTypeField()
     Image = ImageField()
     last_modified = DateTimeField(default=datetime.datetime.now)
+    ready = BooleanField(default=True)
 
     @classmethod
     def get_or_create(cls, **kwargs) -> tuple["Image", bool]:
-        defaults = kwargs.pop("defaults", {})
-        query = cls.select()
-        hash = kwargs.get("hash")
-        query = query.where((cls.hash == hash))
-
-        try:
-            return query.get(), False
-        except cls.DoesNotExist:
+        kwargs.update(kwargs.pop("defaults", {}))
+        image_path = Path(kwargs.pop("Image"))
+        assert image_path.exists()
+        stem = kwargs.get("hash")
+        assert stem
+        with SingleFlight.lock(f"image:{stem}"):
+            instance, created = cls.upsert(
+                cls.hash, **kwargs, Image=f"{stem}.webp", ready=False
+            )
+            if not created and (
+                instance.ready
+                or not cls.claim_stale(instance.id, app_config.api.ingest_timeout)
+            ):
+                return instance, False
+            stem = Path(instance.Image).stem
             try:
-                if defaults:
-                    kwargs.update(defaults)
-                return cls.create(**kwargs), True
-            except IntegrityError as exc:
-                try:
-                    return query.get(), False
-                except cls.DoesNotExist:
-                    raise exc
+                deferred = ImageField.store(image_path, stem)
+            except Exception:
+                if created:
+                    cls.delete().where(cls.id == instance.id).execute()
+                raise
+            if deferred:
+                rendition_executor().submit(instance.render_deferred, image_path, stem)
+            else:
+                cls.update(ready=True).where(cls.id == instance.id).execute()
+                instance.ready = True
+            return instance, created
+
+    @classmethod
+    def claim_stale(cls, id: int, stale_after: int) -> bool:
+        now = datetime.datetime.now()
+        stale = now - datetime.timedelta(seconds=stale_after)
+        query = cls.update(last_modified=now).where(
+            (cls.id == id) & (cls.ready == False) & (cls.last_modified < stale)
+        )
+        return query.execute() > 0
 
     def save(self, *args, **kwds):
         if "only" not in kwds:
             self.last_modified = datetime.datetime.now(tz=datetime.timezone.utc)
         return super().save(*args, **kwds)
 
+    def render_deferred(self, image_path: Path, stem: str):
+        try:
+            S3.upload_many(
+                [(r.data, r.fname(stem)) for r in renditions(image_path, raw=False)],
+                immutable=True,
+            )
+            cls = self.__class__
+            cls.update(ready=True).where(cls.id == self.id).execute()
+            self.ready = True
+        except Exception as e:
+            logging.exception(e)
+
     @property
     def tmp_path(self) -> Path:
         raw_src = ImageField.raw_src(Path(self.Image))
@@ -54,7 +90,7 @@ class Image(DbModel):
         return ImageField.download(key)
 
     def to_response(self, **kwds):
-        return ImageField.to_response(image=self.Image, hash=self.hash)
+        return ImageField.to_response(image=self.Image, hash=self.hash, ready=self.ready)
 
     class Meta:
         database = Database.db
@@ -4,7 +4,7 @@ from faceapi.database.fields import CleanCharField, CleanTextField
 from .base import DbModel
 from faceapi.database import Database
 from faceapi.routers.models import PromptResponse
-from peewee import FloatField, IntegerField, IntegrityError, DoubleField
+from peewee import FloatField, IntegerField, DoubleField
 from corestring import split_with_quotes, string_hash
 from argparse import ArgumentParser
 from pydantic import BaseModel, validator
@@ -91,29 +91,20 @@ class Prompt(DbModel):
 
     @classmethod
     def get_or_create(cls, **kwargs) -> tuple["Prompt", bool]:
-        defaults = kwargs.pop("defaults", {})
-        query = cls.select()
+        kwargs.update(kwargs.pop("defaults", {}))
         logging.info(kwargs)
-        hash = cls.get_hash(**kwargs)
-        query = query.where(cls.hash == hash)
-        try:
-            return query.get(), False
-        except cls.DoesNotExist:
-            try:
-                if defaults:
-                    kwargs.update(defaults)
-                return cls.create(**kwargs), True
-            except IntegrityError as exc:
-                try:
-                    return query.get(), False
-                except cls.DoesNotExist:
-                    raise exc
+        kwargs["hash"] = cls.get_hash(**kwargs)
+        return cls.upsert(cls.hash, **kwargs)
 
     @classmethod
     def create(cls, **query):
         query["hash"] = cls.get_hash(**query)
         return super().create(**query)
 
+    @property
+    def affinity(self) -> str:
+        return f"{self.model or ''}:{self.template or ''}"
+
     def to_json(self):
         return json.dumps(self.to_dict())
 
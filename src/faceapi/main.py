@@ -10,10 +10,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from faceapi.config import app_config
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
-from faceapi.core.generator import Generator
+from faceapi.core.generator import GeneratorPool
+from faceapi.masha.pool import HealthChecker
+from faceapi.masha.client import HttpClient
 import signal
 from apscheduler.schedulers.background import BackgroundScheduler
-from faceapi.core.jobs import update_options, update_access
+from faceapi.core.jobs import update_options, update_access, resume_renditions
+from faceapi.core.image import ImageFetcher
 
 ASSETS_PATH = Path(__file__).parent.parent / "assets"
 
@@ -47,16 +50,27 @@ def create_app():
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
-        expose_headers=["x-pagination-page", "x-pagination-total", "x-pagination-next"],
+        expose_headers=[
+            "x-pagination-page",
+            "x-pagination-total",
+            "x-pagination-next",
+            "x-pagination-cursor",
+        ],
     )
 
     app.include_router(api.router)
+    app.add_event_handler("shutdown", ImageFetcher.close)
     return app
 
 
 queue = GeneratorQueue()
-generator_worker = Generator(queue=queue)
-generator_worker.start()
+generator_pool = GeneratorPool(queue=queue, size=app_config.api.generators)
+generator_pool.start()
+
+health_checker = HealthChecker(
+    interval=app_config.masha.health_interval, name="masha-health", daemon=True
+)
+health_checker.start()
 
 scheduler = Scheduler(BackgroundScheduler(), app_config.redis.url)
 
@@ -84,11 +98,24 @@ if not Scheduler.is_running:
         replace_existing=True,
     )
 
+    Scheduler.add_job(
+        id="resume_renditions",
+        func=resume_renditions,
+        trigger="interval",
+        minutes=10,
+        misfire_grace_time=300,
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+
     Scheduler.start()
 
 
 def handler_stop_signals(signum, frame):
-    generator_worker.stop()
+    generator_pool.stop()
+    health_checker.stop()
+    HttpClient.close()
     Database.db.close()
     Scheduler.stop()
     TempPath.clean()
@@ -1,32 +1,79 @@
 import logging
 from typing import Any, Optional
-from cachable.request import Method, Request
+from cachable.request import Method
 from pathlib import Path
-from fastapi import HTTPException
 import filetype
 from functools import reduce
 import json
+import httpx
 from faceapi.config import app_config
-from uuid import uuid4
-from corefile import TempPath
 
 from faceapi.masha.models import ENDPOINT, APIError
+from faceapi.masha.pool import Backend, BackendPool, NoBackendAvailable
+from faceapi.masha.multipart import MultipartStreamParser
+
+FAILOVER_STATUSES = (502, 503, 504)
+
+
+class HttpClientMeta(type):
+    _instance: Optional[httpx.Client] = None
+
+    def __call__(cls, *args, **kwargs):
+        if not cls._instance:
+            cfg = app_config.masha
+            cls._instance = httpx.Client(
+                http1=True,
+                timeout=httpx.Timeout(cfg.read_timeout, connect=cfg.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=cfg.max_connections,
+                    max_keepalive_connections=cfg.max_keepalive_connections,
+                ),
+            )
+        return cls._instance
+
+    def close(cls):
+        if cls._instance:
+            cls._instance.close()
+            cls._instance = None
+
+
+class HttpClient(object, metaclass=HttpClientMeta):
+    pass
 
 
 class Client:
 
+    attachment_hash: Optional[str] = None
+
     def __make_request(
         self,
+        backend: Backend,
         path: str,
         json_data: dict = {},
         attachment: Path = None,
         method: Method = Method.POST,
-    ):
+    ) -> httpx.Response:
         params: dict = {}
-        if attachment:
-            kind = filetype.guess(attachment.as_posix())
-            fp = attachment.open("rb")
-            assert kind
+        fields = reduce(
+            lambda r, x: {
+                **r,
+                **({x: json_data.get(x)} if json_data.get(x, None) is not None else {}),
+            },
+            json_data.keys(),
+            {},
+        )
+        url = f"{backend.url}/{path}"
+        http_method = str(method.value).upper()
+        if not attachment:
+            logging.debug(fields)
+            req = HttpClient().build_request(http_method, url, json=fields)
+            return HttpClient().send(req, stream=True)
+
+        kind = filetype.guess(attachment.as_posix())
+        assert kind
+        params["data"] = {**fields, "data": json.dumps(fields)}
+        logging.debug(params)
+        with attachment.open("rb") as fp:
             params["files"] = {
                 "file": (
                     f"{attachment.stem}.{kind.extension}",
@@ -35,43 +82,34 @@ class Client:
                     {"Expires": "0"},
                 )
             }
-            form_data = reduce(
-                lambda r, x: {
-                    **r,
-                    **(
-                        {x: json_data.get(x)}
-                        if json_data.get(x, None) is not None
-                        else {}
-                    ),
-                },
-                json_data.keys(),
-                {},
-            )
-            params["data"] = {**form_data, "data": json.dumps(form_data)}
-            logging.debug(params)
-        else:
-            params["json"] = reduce(
-                lambda r, x: {
-                    **r,
-                    **(
-                        {x: json_data.get(x)}
-                        if json_data.get(x, None) is not None
-                        else {}
-                    ),
-                },
-                json_data.keys(),
-                {},
-            )
-            logging.debug(params["json"])
-
-        extra_headers = {}
+            req = HttpClient().build_request(http_method, url, **params)
+            return HttpClient().send(req, stream=True)
 
-        return Request(
-            f"http://{app_config.masha.host}:{app_config.masha.port}/{path}",
-            method=method,
-            extra_headers=extra_headers,
-            **params,
-        )
+    def __dispatch(self, **kwds) -> httpx.Response:
+        tried: list[Backend] = []
+        error: Optional[Exception] = None
+        while True:
+            try:
+                backend = BackendPool.choose(exclude=tried)
+            except NoBackendAvailable as e:
+                raise error or e
+            tried.append(backend)
+            try:
+                with backend:
+                    res = self.__make_request(backend=backend, **kwds)
+            except httpx.TransportError as e:
+                logging.warning(f"masha backend {backend.url} failed: {e}")
+                backend.failure()
+                error = e
+                continue
+            if res.status_code in FAILOVER_STATUSES:
+                res.close()
+                logging.warning(f"masha backend {backend.url} returned {res.status_code}")
+                backend.failure()
+                error = APIError(res.status_code, res.reason_phrase)
+                continue
+            backend.success()
+            return res
 
     def getResponse(
         self,
@@ -80,39 +118,34 @@ class Client:
         attachment: Path = None,
         method=Method.POST,
     ):
-        req = self.__make_request(
+        res = self.__dispatch(
             path=path, json_data=data, attachment=attachment, method=method
         )
-        if all([req.status > 400, req.status < 600]):
-            raise APIError(req.status, req.json.get("detail"))
+        try:
+            return self.__read_response(res)
+        finally:
+            res.close()
+
+    def __read_response(self, res: httpx.Response):
+        if all([res.status_code > 400, res.status_code < 600]):
+            res.read()
+            raise APIError(res.status_code, res.json().get("detail"))
         message = ""
         attachment = None
-        is_multipart = req.is_multipart
+        content_type = res.headers.get("content-type", "")
+        is_multipart = content_type.startswith("multipart/")
         if is_multipart:
-            multipart = req.multipart
+            multipart = MultipartStreamParser.parse(content_type, res.iter_bytes())
             for part in multipart.parts:
-                content_type = part.headers.get(
-                    b"content-type",  # type: ignore
-                    b"",  # type: ignore
-                ).decode()
-                if "image/png" in content_type:
-                    fp = TempPath(f"{uuid4().hex}.png")
-                    fp.write_bytes(part.content)
-                    attachment = fp
-                elif "image/jpeg" in content_type:
-                    fp = TempPath(f"{uuid4().hex}.jpg")
-                    fp.write_bytes(part.content)
-                    attachment = fp
-                elif "image/webp" in content_type:
-                    fp = TempPath(f"{uuid4().hex}.webp")
-                    fp.write_bytes(part.content)
-                    attachment = fp
-
+                if part.is_image:
+                    attachment = part.path
+                    self.attachment_hash = part.hash
                 else:
                     message = part.text
         else:
             try:
-                message = req.json
+                res.read()
+                message = res.json()
             except json.JSONDecodeError as e:
                 logging.error(e)
                 raise e
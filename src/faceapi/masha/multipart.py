@@ -0,0 +1,144 @@
+from typing import Iterable, Optional
+from uuid import uuid4
+from corefile import TempPath
+from faceapi.core.hashing import HashingWriter
+
+IMAGE_EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/webp": "webp",
+}
+
+
+class MultipartError(Exception):
+    pass
+
+
+class StreamingPart(object):
+
+    def __init__(self, headers: dict[str, str]):
+        self.headers = headers
+        self.content_type = headers.get("content-type", "")
+        self.path: Optional[TempPath] = None
+        self.hash: Optional[str] = None
+        self.__text = bytearray()
+        self.__fp = None
+        self.__writer: Optional[HashingWriter] = None
+        if ext := next(
+            (v for k, v in IMAGE_EXTENSIONS.items() if k in self.content_type), None
+        ):
+            self.path = TempPath(f"{uuid4().hex}.{ext}")
+            self.__fp = self.path.open("wb")
+            self.__writer = HashingWriter(self.__fp)
+
+    @property
+    def is_image(self) -> bool:
+        return self.path is not None
+
+    @property
+    def text(self) -> str:
+        return self.__text.decode()
+
+    def write(self, data: bytes):
+        if self.__writer:
+            self.__writer.write(data)
+        else:
+            self.__text.extend(data)
+
+    def close(self):
+        if self.__fp:
+            self.__fp.close()
+            self.hash = self.__writer.hexdigest
+
+
+class MultipartStreamParser(object):
+
+    def __init__(self, content_type: str):
+        boundary = next(
+            (
+                p.split("=", 1)[1].strip('"')
+                for p in map(str.strip, content_type.split(";"))
+                if p.startswith("boundary=")
+            ),
+            None,
+        )
+        if not boundary:
+            raise MultipartError(f"no boundary in {content_type}")
+        self.__delimiter = b"--" + boundary.encode()
+        self.__separator = b"\r\n" + self.__delimiter
+        self.__buffer = bytearray()
+        self.__state = "preamble"
+        self.__part: Optional[StreamingPart] = None
+        self.parts: list[StreamingPart] = []
+
+    def feed(self, chunk: bytes):
+        self.__buffer.extend(chunk)
+        while self.__step():
+            pass
+
+    def __step(self) -> bool:
+        buf = self.__buffer
+        match self.__state:
+            case "preamble":
+                idx = buf.find(self.__delimiter)
+                if idx < 0:
+                    return False
+                del buf[: idx + len(self.__delimiter)]
+                self.__state = "delimiter"
+                return True
+            case "delimiter":
+                if len(buf) < 2:
+                    return False
+                if buf[:2] == b"--":
+                    self.__state = "epilogue"
+                    return False
+                idx = buf.find(b"\r\n")
+                if idx < 0:
+                    return False
+                del buf[: idx + 2]
+                self.__state = "headers"
+                return True
+            case "headers":
+                idx = buf.find(b"\r\n\r\n")
+                if idx < 0:
+                    return False
+                headers = {}
+                for line in bytes(buf[:idx]).decode("latin-1").split("\r\n"):
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                del buf[: idx + 4]
+                self.__part = StreamingPart(headers)
+                self.__state = "body"
+                return True
+            case "body":
+                assert self.__part
+                idx = buf.find(self.__separator)
+                if idx < 0:
+                    keep = len(self.__separator) - 1
+                    if len(buf) > keep:
+                        self.__part.write(bytes(buf[:-keep]))
+                        del buf[:-keep]
+                    return False
+                self.__part.write(bytes(buf[:idx]))
+                self.__part.close()
+                self.parts.append(self.__part)
+                self.__part = None
+                del buf[: idx + len(self.__separator)]
+                self.__state = "delimiter"
+                return True
+            case _:
+                buf.clear()
+                return False
+
+    def close(self):
+        if self.__part:
+            self.__part.close()
+            raise MultipartError("unexpected end of multipart stream")
+
+    @classmethod
+    def parse(cls, content_type: str, chunks: Iterable[bytes]) -> "MultipartStreamParser":
+        parser = cls(content_type)
+        for chunk in chunks:
+            parser.feed(chunk)
+        parser.close()
+        return parser
@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+from typing import Optional
+import httpx
+from corethread import StoppableThread
+from faceapi.config import app_config
+from faceapi.masha.models import ENDPOINT, APIError
+
+
+class NoBackendAvailable(APIError):
+
+    def __init__(self, *args: object) -> None:
+        super().__init__(503, "No masha backend available", *args)
+
+
+class Backend(object):
+
+    def __init__(self, host: str, port: int, failure_threshold: int, reset_timeout: int):
+        self.url = f"http://{host}:{port}"
+        self.outstanding = 0
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.__failure_threshold = failure_threshold
+        self.__reset_timeout = reset_timeout
+        self.__lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"<Backend {self.url} outstanding={self.outstanding} failures={self.failures}>"
+
+    def __enter__(self):
+        with self.__lock:
+            self.outstanding += 1
+        return self
+
+    def __exit__(self, *args):
+        with self.__lock:
+            self.outstanding -= 1
+
+    @property
+    def available(self) -> bool:
+        try:
+            assert self.opened_at
+            return time.time() - self.opened_at > self.__reset_timeout
+        except AssertionError:
+            return True
+
+    def success(self):
+        with self.__lock:
+            if self.opened_at:
+                logging.info(f"masha backend {self.url} recovered")
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        with self.__lock:
+            self.failures += 1
+            if self.failures >= self.__failure_threshold:
+                if not self.opened_at:
+                    logging.warning(f"masha backend {self.url} circuit open")
+                self.opened_at = time.time()
+
+
+class BackendPoolMeta(type):
+    _instance: Optional["BackendPool"] = None
+
+    def __call__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = type.__call__(cls, *args, **kwargs)
+        return cls._instance
+
+    def choose(cls, exclude: list[Backend] = []) -> Backend:
+        return cls().choose_backend(exclude)
+
+    def check(cls):
+        return cls().check_backends()
+
+
+class BackendPool(object, metaclass=BackendPoolMeta):
+
+    def __init__(self) -> None:
+        cfg = app_config.masha
+        backends = cfg.backends or [cfg]
+        self.backends = [
+            Backend(
+                host=b.host,
+                port=b.port,
+                failure_threshold=cfg.failure_threshold,
+                reset_timeout=cfg.reset_timeout,
+            )
+            for b in backends
+        ]
+
+    def choose_backend(self, exclude: list[Backend] = []) -> Backend:
+        candidates = [b for b in self.backends if b.available and b not in exclude]
+        try:
+            assert candidates
+            return min(candidates, key=lambda b: b.outstanding)
+        except AssertionError:
+            raise NoBackendAvailable
+
+    def check_backends(self):
+        for backend in self.backends:
+            try:
+                res = httpx.get(
+                    f"{backend.url}/{ENDPOINT.FACE2IMG_OPTIONS}", timeout=5
+                )
+                assert res.status_code < 500
+                backend.success()
+            except Exception as e:
+                logging.debug(f"health check {backend.url} failed: {e}")
+                backend.failure()
+
+
+class HealthChecker(StoppableThread):
+
+    def __init__(self, interval: int, *args, **kwargs):
+        self.interval = interval
+        super().__init__(*args, **kwargs)
+
+    def run(self):
+        while not self.stopped():
+            try:
+                BackendPool.check()
+            except Exception as e:
+                logging.exception(e)
+            time.sleep(self.interval)
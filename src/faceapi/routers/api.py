@@ -14,23 +14,36 @@ from fastapi import (
     UploadFile,
 )
 from faceapi.core.commands import Command
-from faceapi.core.queue import GeneratorQueue
+from faceapi.core.queue import GeneratorQueue, Priority
 from faceapi.database.database import Database
 from faceapi.database.enums import ImageType, Status
 from faceapi.database.models import Generated, Image
 from fastapi.responses import JSONResponse
-from datetime import datetime
-from peewee import DoesNotExist
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from inspect import iscoroutinefunction
+from datetime import datetime, timedelta, timezone
+from peewee import DoesNotExist, Tuple
+from playhouse.signals import post_save
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 
 from faceapi.database.models.prompt import Prompt
 from .auth import check_auth
 from faceapi.config import app_config
-from corestring import file_hash
+from faceapi.core.hashing import content_hash
 from faceapi.core.api import uploaded_file
-from faceapi.core.image import download_image
+from faceapi.core.image import download_image, ImageFetchError
 import json
 
-router = APIRouter()
+class DatabaseRoute(APIRoute):
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if not iscoroutinefunction(endpoint):
+            endpoint = Database.connection(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+router = APIRouter(route_class=DatabaseRoute)
 
 
 def get_list_response(
@@ -41,9 +54,9 @@ def get_list_response(
     if last_modified:
         filters.append(Generated.last_modified > last_modified)
 
-    base_query = Generated.select()
+    base_query = Generated.with_related()
     query = base_query.where(*filters).order_by(Generated.last_modified.desc())
-    total = query.count()
+    total = Generated.select().where(*filters).count()
     if total > 0:
         page = min(max(1, page), floor(total / limit) + 1)
     results = [rec.to_response().model_dump() for rec in query.paginate(page, limit)]
@@ -79,13 +92,73 @@ def get_list_response(
     return JSONResponse(content=results, headers=headers)
 
 
+def encode_cursor(rec: Generated) -> str:
+    data = json.dumps([rec.last_modified.isoformat(), rec.slug])
+    return urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        last_modified, slug = json.loads(urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(last_modified), slug
+    except (ValueError, TypeError):
+        raise HTTPException(400, detail="invalid cursor")
+
+
+def get_cursor_response(
+    uid: str,
+    cursor: str,
+    limit: int = 50,
+    last_modified: Optional[datetime] = None,
+    with_total: bool = False,
+):
+    filters = [Generated.uid == uid]
+    if last_modified:
+        filters.append(Generated.last_modified > last_modified)
+    headers = {}
+    if with_total:
+        headers["x-pagination-total"] = f"{Generated.select().where(*filters).count()}"
+    if cursor:
+        cursor_modified, cursor_slug = decode_cursor(cursor)
+        filters.append(
+            Tuple(Generated.last_modified, Generated.slug)
+            < Tuple(cursor_modified, cursor_slug)
+        )
+    query = (
+        Generated.with_related()
+        .where(*filters)
+        .order_by(Generated.last_modified.desc(), Generated.slug.desc())
+        .limit(limit)
+    )
+    records = list(query)
+    results = [rec.to_response().model_dump() for rec in records]
+    if len(records) == limit:
+        next_cursor = encode_cursor(records[-1])
+        params = dict(cursor=next_cursor, limit=limit)
+        headers["x-pagination-cursor"] = next_cursor
+        headers["x-pagination-next"] = (
+            f"{app_config.api.web_host}/api/generated?{urlencode(params)}"
+        )
+    return JSONResponse(content=results, headers=headers)
+
+
 @router.get("/api/generated", tags=["api"])
 def api_generations(
     page: Annotated[int, Query()] = 1,
     limit: Annotated[int, Query()] = 20,
     last_modified: Annotated[datetime, Query()] = None,
+    cursor: Annotated[str, Query()] = None,
+    total: Annotated[bool, Query()] = False,
     auth_user=Depends(check_auth),
 ):
+    if cursor is not None:
+        return get_cursor_response(
+            cursor=cursor,
+            limit=limit,
+            last_modified=last_modified,
+            with_total=total,
+            uid=auth_user.uid,
+        )
     return get_list_response(
         page=page, limit=limit, last_modified=last_modified, uid=auth_user.uid
     )
@@ -98,7 +171,7 @@ def api_generated(
     try:
         with Database.db.atomic():
             record = (
-                Generated.select(Generated)
+                Generated.with_related()
                 .where((Generated.slug == slug) & (Generated.uid == auth_user.uid))
                 .get()
             )
@@ -115,7 +188,7 @@ def api_generated_delete(
 ):
     try:
         record: Generated = (
-            Generated.select(Generated)
+            Generated.with_related()
             .where((Generated.slug == slug) & (Generated.uid == auth_user.uid))
             .get()
         )
@@ -127,45 +200,119 @@ def api_generated_delete(
         raise HTTPException(404)
 
 
-@router.post("/api/generate", tags=["api"])
+@Database.connection
+def check_admission(auth_user=Depends(check_auth)):
+    cfg = app_config.queue
+    queue = GeneratorQueue()
+    # rows left behind by a dead worker stop counting once their lease is over
+    active_since = datetime.now(tz=timezone.utc) - timedelta(
+        seconds=cfg.visibility_timeout
+    )
+    try:
+        assert not cfg.max_depth or queue.qsize() < cfg.max_depth
+        assert (
+            not cfg.max_per_uid
+            or Generated.select()
+            .where(
+                (Generated.uid == auth_user.uid)
+                & (Generated.Status.in_([Status.PENDING, Status.IN_PROGRESS]))
+                & (Generated.last_modified > active_since)
+            )
+            .count()
+            < cfg.max_per_uid
+        )
+    except AssertionError:
+        wait = queue.estimated_wait()
+        retry_after = ceil(wait) if wait else cfg.retry_after
+        raise HTTPException(
+            status_code=429,
+            detail="Too many pending generations",
+            headers={"Retry-After": f"{retry_after}"},
+        )
+
+
+@Database.connection
+def submit_generation(
+    uid: str,
+    face_path: str,
+    face_hash: str,
+    data_json: dict,
+    reuse: bool,
+    use_cache: bool,
+):
+    source, _ = Image.get_or_create(
+        Type=ImageType.SOURCE,
+        Image=face_path,
+        hash=face_hash,
+    )
+    prompt, _ = Prompt.get_or_create(**data_json)
+    generated, _ = Generated.get_or_create(uid=uid, source=source, prompt=prompt)
+    logging.info(f"GENERATED STATUS -> {generated.Status}, reuse={reuse}")
+    if all([reuse, generated.Status == Status.GENERATED]):
+        return generated.to_response().model_dump()
+
+    with Database.db.atomic():
+        pending = Generated.mark_pending(
+            generated.slug, stale_after=app_config.queue.visibility_timeout
+        )
+    if not pending:
+        logging.info(f"{generated.slug} is in progress, not requeued")
+        generated.Status = Status.IN_PROGRESS
+        return generated.to_response(
+            estimated_wait=GeneratorQueue().estimated_wait()
+        ).model_dump()
+    generated.Status = Status.PENDING
+    post_save.send(generated, created=False)
+    logging.info(f"GENERATED STATUS -> {generated.Status}, reuse={reuse}")
+    command = Command.GENERATE if use_cache else Command.REGENERATE
+    if not GeneratorQueue().put_nowait(
+        (command, generated.slug),
+        uid=generated.uid,
+        priority=Priority.INTERACTIVE,
+        affinity=prompt.affinity,
+    ):
+        logging.info(f"{generated.slug} already queued")
+    return generated.to_response(
+        estimated_wait=GeneratorQueue().estimated_wait()
+    ).model_dump()
+
+
+@router.post("/api/generate", tags=["api"], dependencies=[Depends(check_admission)])
 async def api_generate(
     data: Annotated[str, Form()],
     file: Annotated[UploadFile, File()] = None,
     auth_user=Depends(check_auth),
 ):
     face_path = None
+    face_hash = None
     data_json = json.loads(data)
+    use_cache = data_json.pop("cache", True)
     reuse = True
     try:
         assert file
-        face_path = await uploaded_file(file)
+        face_path, face_hash = await uploaded_file(file)
     except AssertionError:
         image_url = data_json.get("image_url")
         del data_json["image_url"]
-        face_path = await download_image(image_url)
+        try:
+            face_path = await download_image(image_url)
+        except ImageFetchError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         reuse = False
         if not data_json.get("seed", None):
             data_json["seed"] = -1
         logging.info(f"fetched file from {image_url}")
-    source, _ = Image.get_or_create(
-        Type=ImageType.SOURCE,
-        Image=face_path.as_posix(),
-        hash=file_hash(face_path),
-    )
-    prompt, _ = Prompt.get_or_create(**data_json)
-    generated, _ = Generated.get_or_create(
-        uid=auth_user.uid, source=source, prompt=prompt
+    if not face_hash:
+        face_hash = await run_in_threadpool(content_hash, face_path)
+    return await run_in_threadpool(
+        submit_generation,
+        uid=auth_user.uid,
+        face_path=face_path.as_posix(),
+        face_hash=face_hash,
+        data_json=data_json,
+        reuse=reuse,
+        use_cache=use_cache,
     )
-    logging.info(f"GENERATED STATUS -> {generated.Status}, reuse={reuse}")
-    if all([reuse, generated.Status == Status.GENERATED]):
-        return generated.to_response().model_dump()
-
-    with Database.db.atomic():
-        generated.Status = Status.PENDING
-        generated.save(only=["Status"])
-    logging.info(f"GENERATED STATUS -> {generated.Status}, reuse={reuse}")
-    GeneratorQueue().put_nowait((Command.GENERATE, generated.slug))
-    return generated.to_response().model_dump()
 
 
 @router.get("/api/access/", tags=["api"])
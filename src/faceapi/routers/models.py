@@ -24,6 +24,7 @@ class ImageResponse(BaseResponse):
     webp_src: str
     raw_src: str
     hash: str
+    ready: bool = True
 
 class PromptResponse(BaseResponse):
     hash: str
@@ -50,4 +51,5 @@ class GeneratedReponse(BaseResponse):
     image: Optional[ImageResponse] = None
     source: Optional[ImageResponse] = None
     error: Optional[str] = None
+    estimated_wait: Optional[float] = None
 
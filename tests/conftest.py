@@ -0,0 +1,52 @@
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+SRC = Path(__file__).parent.parent / "src"
+
+SETTINGS = """
+db: {{url: "postgres://localhost/faceapi"}}
+redis: {{url: "redis://localhost/0"}}
+cache: {{path: "{tmp}/cache"}}
+api: {{host: "localhost", port: 0, assets: "{tmp}/assets"}}
+aws:
+  cloudfront_host: localhost
+  access_key_id: test
+  secret_access_key: test
+  s3_region: us-east-1
+  storage_bucket_name: test
+  media_location: media
+firebase: {{admin_json: "{tmp}/firebase.json", db: "https://faceapi-test.firebaseio.com"}}
+masha: {{host: "127.0.0.1", port: 0, failure_threshold: 1}}
+access: {{nsfw: {{}}}}
+"""
+
+
+def service_account() -> dict:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    return {
+        "type": "service_account",
+        "project_id": "faceapi-test",
+        "private_key_id": "test",
+        "private_key": pem.decode(),
+        "client_email": "test@faceapi-test.iam.gserviceaccount.com",
+        "client_id": "0",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }
+
+
+tmp = Path(tempfile.mkdtemp(prefix="faceapi-tests-"))
+(tmp / "firebase.json").write_text(json.dumps(service_account()))
+(tmp / "settings.yaml").write_text(SETTINGS.format(tmp=tmp))
+os.environ["FACE_CONFIG_FILE"] = (tmp / "settings.yaml").as_posix()
+sys.path.insert(0, SRC.as_posix())
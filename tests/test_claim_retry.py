@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+
+from peewee import SqliteDatabase
+
+from faceapi.core.commands import Command
+from faceapi.core.queue import GeneratorQueue
+from faceapi.database import Generated, Image, Prompt
+from faceapi.database.enums import ImageType, Status
+
+MODELS = [Image, Prompt, Generated]
+
+
+def test_retry_keeps_job_inflight_and_requeues():
+    queue = GeneratorQueue()
+    job = (Command.GENERATE, "slug")
+    assert queue.put_nowait(job, uid="uid")
+    assert queue.get(timeout=1) == job
+    queue.retry(0.05)
+    queue.task_done()
+    assert not queue.put_nowait(job, uid="uid")
+    assert queue.get(timeout=1) == job
+    queue.task_done()
+    assert queue.empty()
+    assert queue.put_nowait(job, uid="uid")
+    queue.get(timeout=1)
+    queue.task_done()
+
+
+def test_claim_and_release_stale(monkeypatch):
+    database = SqliteDatabase(":memory:")
+    # sqlite has no timestamptz, keep the offset peewee would drop
+    monkeypatch.setattr(Generated.last_modified, "python_value", datetime.fromisoformat)
+    old = datetime.now(tz=timezone.utc) - timedelta(hours=1)
+    with database.bind_ctx(MODELS):
+        database.create_tables(MODELS)
+        Prompt.insert(hash="prompt", prompt="portrait").execute()
+        Image.insert(hash="source", Type=ImageType.SOURCE, Image="source.webp").execute()
+        Generated.insert_many(
+            [
+                dict(slug=slug, uid="uid", source=1, prompt=1, Status=status, last_modified=old)
+                for slug, status in [
+                    ("done", Status.GENERATED),
+                    ("failed", Status.ERROR),
+                    ("orphan", Status.IN_PROGRESS),
+                ]
+            ]
+        ).execute()
+        assert not Generated.claim("done", stale_after=60)
+        assert Generated.claim("failed", stale_after=60)
+        assert not Generated.claim("failed", stale_after=60)
+        assert Generated.release_stale(stale_after=60) == 1
+        assert Generated.get(Generated.slug == "orphan").Status == Status.PENDING
+        assert Generated.claim("orphan", stale_after=60)
@@ -0,0 +1,83 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from peewee import SqliteDatabase
+
+from faceapi.database import Generated, Image, Prompt
+from faceapi.database.enums import ImageType, Status
+from faceapi.routers.api import get_cursor_response, get_list_response
+
+MODELS = [Image, Prompt, Generated]
+ROWS = 60
+PAGE = 50
+
+
+class CountingDatabase(SqliteDatabase):
+
+    def __init__(self, *args, **kwargs):
+        self.queries: list[str] = []
+        super().__init__(*args, **kwargs)
+
+    def execute_sql(self, sql, *args, **kwargs):
+        self.queries.append(sql)
+        return super().execute_sql(sql, *args, **kwargs)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = CountingDatabase(":memory:")
+    # sqlite has no timestamptz, keep the offset peewee would drop
+    monkeypatch.setattr(Generated.last_modified, "python_value", datetime.fromisoformat)
+    with database.bind_ctx(MODELS):
+        database.create_tables(MODELS)
+        now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        Prompt.insert(hash="prompt", prompt="portrait").execute()
+        Image.insert_many(
+            [
+                dict(
+                    hash=f"image-{i}",
+                    Type=ImageType.SOURCE,
+                    Image=f"image-{i}.webp",
+                    last_modified=now,
+                )
+                for i in range(ROWS * 2)
+            ]
+        ).execute()
+        Generated.insert_many(
+            [
+                dict(
+                    slug=f"slug-{i:03d}",
+                    uid="uid",
+                    source=i * 2 + 1,
+                    image=i * 2 + 2,
+                    prompt=1,
+                    Status=Status.GENERATED,
+                    last_modified=now + timedelta(minutes=i),
+                )
+                for i in range(ROWS)
+            ]
+        ).execute()
+        database.queries.clear()
+        yield database
+
+
+def test_cursor_page_is_one_query(db):
+    res = get_cursor_response(uid="uid", cursor="", limit=PAGE)
+    results = json.loads(res.body)
+    assert len(results) == PAGE
+    assert all(r["prompt"] and r["image"] and r["source"] for r in results)
+    assert len(db.queries) == 1
+
+    db.queries.clear()
+    res = get_cursor_response(
+        uid="uid", cursor=res.headers["x-pagination-cursor"], limit=PAGE
+    )
+    assert len(json.loads(res.body)) == ROWS - PAGE
+    assert len(db.queries) == 1
+
+
+def test_list_page_is_count_and_one_query(db):
+    res = get_list_response(uid="uid", page=1, limit=PAGE)
+    assert len(json.loads(res.body)) == PAGE
+    assert len(db.queries) == 2
@@ -0,0 +1,35 @@
+import os
+
+from corestring import file_hash
+
+from faceapi.core.hashing import CHUNK_SIZE, HashingWriter, algorithm
+from faceapi.masha.multipart import StreamingPart
+
+
+def chunks(data: bytes):
+    for i in range(0, len(data), CHUNK_SIZE):
+        yield data[i : i + CHUNK_SIZE]
+
+
+def test_file_hash_is_computed_incrementally():
+    assert algorithm() is not None
+
+
+def test_streamed_upload_matches_file_hash(tmp_path):
+    data = os.urandom(CHUNK_SIZE * 5 + 17)
+    path = tmp_path / "upload.jpg"
+    with path.open("wb") as fp:
+        writer = HashingWriter(fp)
+        for chunk in chunks(data):
+            writer.write(chunk)
+    assert writer.hexdigest == file_hash(path)
+
+
+def test_streamed_part_matches_file_hash():
+    data = os.urandom(CHUNK_SIZE * 2 + 3)
+    part = StreamingPart({"content-type": "image/png"})
+    for chunk in chunks(data):
+        part.write(chunk)
+    part.close()
+    assert part.path.read_bytes() == data
+    assert part.hash == file_hash(part.path)
@@ -0,0 +1,109 @@
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from cachable.request import Method
+
+from faceapi.config import MashaBackendConfig, app_config
+from faceapi.masha.client import Client, HttpClient
+from faceapi.masha.models import ENDPOINT, APIError
+from faceapi.masha.pool import BackendPool
+
+
+def stand_in(status: int) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps({"status": status}).encode()
+            self.send_response(status)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    servers = []
+
+    def configure(*statuses: int | None) -> list:
+        ports = []
+        for status in statuses:
+            if status is None:
+                ports.append(closed_port())
+                continue
+            server = stand_in(status)
+            servers.append(server)
+            ports.append(server.server_address[1])
+        monkeypatch.setattr(
+            app_config.masha,
+            "backends",
+            [MashaBackendConfig(host="127.0.0.1", port=p) for p in ports],
+        )
+        BackendPool._instance = None
+        return BackendPool().backends
+
+    yield configure
+    BackendPool._instance = None
+    HttpClient.close()
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def options():
+    return Client().getResponse(path=ENDPOINT.FACE2IMG_OPTIONS, method=Method.GET)
+
+
+def test_fails_over_on_unavailable_status(backends):
+    down, up = backends(503, 200)
+    _, message = options()
+    assert message == {"status": 200}
+    assert down.failures == 1
+    assert up.failures == 0
+
+
+def test_fails_over_on_transport_error(backends):
+    down, up = backends(None, 200)
+    _, message = options()
+    assert message == {"status": 200}
+    assert down.failures == 1
+    assert not down.available
+
+
+def test_raises_last_backend_error(backends):
+    pool = backends(503, 502)
+    with pytest.raises(APIError) as exc:
+        options()
+    assert exc.value.code == 502
+    assert all(b.failures == 1 for b in pool)
+
+
+def test_raises_last_transport_error(backends):
+    backends(None)
+    with pytest.raises(httpx.ConnectError):
+        options()
+
+
+def test_local_errors_do_not_trip_backends(backends, tmp_path):
+    pool = backends(200, 200)
+    with pytest.raises(FileNotFoundError):
+        Client().getResponse(
+            path=ENDPOINT.FACE2IMG, attachment=tmp_path / "missing.png"
+        )
+    assert all(b.failures == 0 and b.available for b in pool)
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta, timezone
+
+from peewee import SqliteDatabase
+
+from faceapi.core.reconcile import orphan_images
+from faceapi.database import Generated, Image, Prompt
+from faceapi.database.enums import ImageType, Status
+
+MODELS = [Image, Prompt, Generated]
+
+
+def test_orphan_images_skip_referenced_and_recent():
+    database = SqliteDatabase(":memory:")
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    old = now - timedelta(days=1)
+    with database.bind_ctx(MODELS):
+        database.create_tables(MODELS)
+        Prompt.insert(hash="prompt", prompt="portrait").execute()
+        for name, modified in [
+            ("source", old),
+            ("result", old),
+            ("pending", old),
+            ("orphan", old),
+            ("recent", now),
+        ]:
+            Image.insert(
+                hash=name, Type=ImageType.SOURCE, Image=f"{name}.webp", last_modified=modified
+            ).execute()
+        Generated.insert_many(
+            [
+                dict(slug="done", uid="uid", source=1, image=2, prompt=1, Status=Status.GENERATED),
+                dict(slug="pending", uid="uid", source=3, image=None, prompt=1, Status=Status.PENDING),
+            ]
+        ).execute()
+        horizon = now - timedelta(hours=1)
+        orphans = Image.select(Image.hash).where(orphan_images(horizon))
+        assert [i.hash for i in orphans] == ["orphan"]
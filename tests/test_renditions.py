@@ -0,0 +1,43 @@
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from faceapi.core.renditions import Rendition, raw_rendition, renditions
+
+XMP = b'<x:xmpmeta xmlns:x="adobe:ns:meta/">gps</x:xmpmeta>'
+
+
+def source(path: Path, orientation: int = 1, metadata: bool = True) -> Path:
+    extra = {}
+    if metadata:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        exif[0x010F] = "Camera"
+        exif.get_ifd(0x8825)[2] = (51.0, 30.0, 0.0)
+        extra = dict(exif=exif, xmp=XMP)
+    Image.new("RGB", (40, 20), "red").save(path, format="JPEG", **extra)
+    return path
+
+
+def opened(rendition: Rendition) -> Image.Image:
+    data = rendition.data
+    img = Image.open(data if isinstance(data, BytesIO) else data.as_posix())
+    img.load()
+    return img
+
+
+@pytest.mark.parametrize("build", [raw_rendition, lambda p: renditions(p)[0]])
+@pytest.mark.parametrize("orientation", [1, 6])
+def test_raw_output_has_no_metadata(tmp_path, build, orientation):
+    img = opened(build(source(tmp_path / "face.jpg", orientation)))
+    assert not img.getexif()
+    assert "xmp" not in img.info
+    assert img.size == ((40, 20) if orientation == 1 else (20, 40))
+
+
+def test_clean_original_is_passed_through(tmp_path):
+    path = source(tmp_path / "face.jpg", metadata=False)
+    assert raw_rendition(path).data == path
+    assert renditions(path)[0].data == path